@@ -5,28 +5,49 @@
 # =======================================================================================
 import os
 import re
-from flask import Flask, request, abort
+import time
+import queue
+import threading
+from flask import Flask, Response, request, abort
 
 from linebot.v3 import WebhookHandler
 from linebot.v3.exceptions import InvalidSignatureError
 from linebot.v3.messaging import (
     Configuration, ApiClient, MessagingApi,
-    ReplyMessageRequest, TextMessage
+    ReplyMessageRequest, PushMessageRequest, TextMessage
 )
+from linebot.v3.messaging.exceptions import ApiException
 from linebot.v3.webhooks import MessageEvent, TextMessageContent
 
-from config import LINE_CHANNEL_SECRET, LINE_CHANNEL_ACCESS_TOKEN
+from config import (
+    LINE_CHANNEL_SECRET, LINE_CHANNEL_ACCESS_TOKEN,
+    WEBHOOK_ASYNC, WEBHOOK_WORKERS, WEBHOOK_QUEUE_SIZE,
+    REPLY_BUDGET_SECONDS, LOG_LEVEL, LOG_FORMAT, LOG_DEBUG_SAMPLE_RATE,
+)
+import rag
 from rag import build_context
 from summarize import summarize_with_gpt
+from retrievers.deadline import Deadline
+from retrievers.metrics import render_prometheus
+from retrievers.logs import get_logger, log_context, new_request_id, setup_logging
 
 
 # =======================================================================================
 #  2. 初始化應用程式 (Initialize Application)
 # =======================================================================================
+setup_logging(LOG_LEVEL, LOG_FORMAT, LOG_DEBUG_SAMPLE_RATE)
+log = get_logger("app")
+
 app = Flask(__name__)
 configuration = Configuration(access_token=LINE_CHANNEL_ACCESS_TOKEN)
 handler = WebhookHandler(LINE_CHANNEL_SECRET)
 
+# 啟動：同步載入本機股票清單快照，FinMind 更新交給背景執行緒（不阻塞 worker 開機）
+rag.startup()
+
+# reply token 只在收到事件後短時間內有效；超過這個秒數就直接改用 push
+REPLY_TOKEN_TTL_SECONDS = 50
+
 
 # =======================================================================================
 #  3. 輔助函式 (Helper Functions)
@@ -37,6 +58,59 @@ def format_response(text: str) -> str:
     return formatted_text
 
 
+def _push_target(event: MessageEvent) -> str:
+    """push API 的收件對象：群組/聊天室優先，否則回給使用者本人"""
+    src = event.source
+    return getattr(src, "group_id", None) or getattr(src, "room_id", None) or src.user_id
+
+
+def send_answer(line_bot_api: MessagingApi, event: MessageEvent, answer: str):
+    """優先使用 reply token；token 已過期（或 reply 失敗）時改用 push API"""
+    messages = [TextMessage(text=answer)]
+    token_age = time.time() - (event.timestamp or 0) / 1000
+    if token_age < REPLY_TOKEN_TTL_SECONDS:
+        try:
+            line_bot_api.reply_message(
+                ReplyMessageRequest(reply_token=event.reply_token, messages=messages)
+            )
+            return
+        except ApiException as e:
+            log.warning("LOG: reply 失敗（status=%s），改用 push 回覆。", e.status)
+    else:
+        log.info("LOG: reply token 已過期（%.1f 秒），改用 push 回覆。", token_age)
+
+    line_bot_api.push_message(
+        PushMessageRequest(to=_push_target(event), messages=messages)
+    )
+
+
+# =======================================================================================
+#  3.5 非同步 Webhook Worker（WEBHOOK_ASYNC=1 時啟用）
+# =======================================================================================
+_WEBHOOK_QUEUE: "queue.Queue" = queue.Queue(maxsize=WEBHOOK_QUEUE_SIZE)
+
+
+def _webhook_worker():
+    while True:
+        body, signature = _WEBHOOK_QUEUE.get()
+        try:
+            handler.handle(body, signature)
+        except Exception as e:
+            log.exception("LOG: 背景處理 webhook 失敗：%s", e)
+        finally:
+            _WEBHOOK_QUEUE.task_done()
+
+
+def start_webhook_workers():
+    for i in range(WEBHOOK_WORKERS):
+        threading.Thread(target=_webhook_worker, name=f"webhook-worker-{i}", daemon=True).start()
+    log.info("LOG: 已啟動 %d 個 webhook worker（佇列上限 %d）", WEBHOOK_WORKERS, WEBHOOK_QUEUE_SIZE)
+
+
+if WEBHOOK_ASYNC:
+    start_webhook_workers()
+
+
 # =======================================================================================
 #  4. 主要路由與邏輯 (Main Routes & Logic)
 # =======================================================================================
@@ -44,7 +118,21 @@ def format_response(text: str) -> str:
 def callback():
     signature = request.headers['X-Line-Signature']
     body = request.get_data(as_text=True)
-    app.logger.info(f"Request body: {body}")
+    log.debug("Request body: %s", body)
+
+    if WEBHOOK_ASYNC:
+        # 先在 request thread 驗簽章，通過後丟進佇列並立即回 200
+        try:
+            handler.parser.parse(body, signature)
+        except InvalidSignatureError:
+            abort(400)
+        try:
+            _WEBHOOK_QUEUE.put_nowait((body, signature))
+        except queue.Full:
+            log.warning("LOG: webhook 佇列已滿（%d），回 503 讓 LINE 重送。", WEBHOOK_QUEUE_SIZE)
+            abort(503)
+        return 'OK'
+
     try:
         handler.handle(body, signature)
     except InvalidSignatureError:
@@ -52,6 +140,20 @@ def callback():
     return 'OK'
 
 
+@app.route("/ready", methods=['GET'])
+def ready():
+    """Readiness probe：股票清單（快照或 FinMind）已載入才回 200"""
+    if rag.is_ready():
+        return 'READY'
+    return 'LOADING', 503
+
+
+@app.route("/metrics", methods=['GET'])
+def metrics():
+    """Prometheus 抓取用：各階段耗時、上游錯誤/逾時、快取命中、OpenAI token 與成本"""
+    return Response(render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+
 @handler.add(MessageEvent, message=TextMessageContent)
 def handle_message(event: MessageEvent):
     user_text = event.message.text.strip()
@@ -59,31 +161,35 @@ def handle_message(event: MessageEvent):
     if not user_text:
         return
 
-    with ApiClient(configuration) as api_client:
-        line_bot_api = MessagingApi(api_client)
-
-        # --- ▼▼▼ 回覆的 LOG 在這裡 ▼▼▼ ---
-        # 步驟 A: 執行 RAG 檢索
-        print(f"LOG: 接收到查詢 '{user_text}', 開始建立上下文...\n")
-        context = build_context(user_text)
-        print(f"LOG: 上下文建立完成。")
-
-        # 步驟 B: 呼叫 GPT 生成總結
-        print("LOG: 開始呼叫 OpenAI API 進行總結...\n")
-        raw_answer = summarize_with_gpt(user_text, context)
-        print(f"LOG: 回應完成。")
-        # --- ▲▲▲ 回覆的 LOG 在這裡 ▲▲▲ ---
-
-        # 步驟 C: 美化排版
-        answer = format_response(raw_answer)
-
-        # 步驟 D: 使用 v3 reply 
-        line_bot_api.reply_message(
-            ReplyMessageRequest(
-                reply_token=event.reply_token,
-                messages=[TextMessage(text=answer)]
-            )
-        )
+    # 時間預算從 LINE 收到訊息的時間起算（含排隊等待時間）
+    event_time = (event.timestamp or 0) / 1000 or None
+    deadline = Deadline(REPLY_BUDGET_SECONDS, start=event_time)
+
+    # 這個事件之後的所有 log 都帶 request_id（LINE 重送同一事件時 webhookEventId 相同）與 elapsed_ms
+    request_id = getattr(event, "webhook_event_id", None) or new_request_id()
+    with log_context(request_id=request_id, started_at=deadline.start):
+        with ApiClient(configuration) as api_client:
+            line_bot_api = MessagingApi(api_client)
+
+            if not rag.is_ready():
+                send_answer(line_bot_api, event, rag.NOT_READY_MESSAGE)
+                return
+
+            # --- ▼▼▼ 回覆的 LOG 在這裡 ▼▼▼ ---
+            # 步驟 A: 執行 RAG 檢索
+            log.info("LOG: 接收到查詢 '%s', 開始建立上下文...", user_text)
+            context = build_context(user_text, deadline=deadline)
+
+            # 步驟 B: 呼叫 GPT 生成總結
+            raw_answer = summarize_with_gpt(user_text, context, deadline=deadline)
+            log.info("LOG: 回應完成（耗時 %.1f 秒，預算 %.0f 秒）。", deadline.elapsed(), REPLY_BUDGET_SECONDS)
+            # --- ▲▲▲ 回覆的 LOG 在這裡 ▲▲▲ ---
+
+            # 步驟 C: 美化排版
+            answer = format_response(raw_answer)
+
+            # 步驟 D: 使用 v3 reply（token 過期則改用 push）
+            send_answer(line_bot_api, event, answer)
 
 
 # =======================================================================================
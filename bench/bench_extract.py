@@ -0,0 +1,131 @@
+# bench/bench_extract.py（全文萃取後端基準測試：時間 / 記憶體 / 輸出品質）
+#
+# 用法（在專案根目錄）：
+#   python bench/bench_extract.py                 # 測所有已安裝後端
+#   python bench/bench_extract.py -n 50 lxml bs4  # 指定次數與後端
+#
+# - 時間：每個 fixture 重複 n 次取中位數（ms）
+# - 記憶體：單次萃取的 tracemalloc 峰值（只含 Python heap；lxml / lexbor 在 C 層的配置不計入）
+# - 品質：與「原本的 bs4 + html.parser」輸出逐行比對的相似度（1.0 = 完全相同）
+import difflib
+import os
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+from glob import glob
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+
+from retrievers.extract import NOISE_TAGS, available_backends, extract_main_text
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "html")
+
+
+def _normalize_ws(s: str) -> str:
+    # 與 retrievers/fulltext.py 相同，比對的是實際進入快取的文字
+    s = re.sub(r"[ \t\r\f\v]+", " ", s)
+    s = re.sub(r"\n{3,}", "\n\n", s)
+    return s.strip()
+
+
+def reference_extract(html: str) -> str:
+    """改版前 fetch_fulltext 的萃取邏輯（bs4 + html.parser），作為品質基準"""
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in soup(NOISE_TAGS):
+        tag.decompose()
+    main = soup.find("article")
+    if main is None:
+        main = soup.find("main") or soup.find(attrs={"id": "content"}) or soup.body
+    if main is None:
+        return ""
+    return main.get_text(separator="\n")
+
+
+def load_fixtures():
+    out = {}
+    for path in sorted(glob(os.path.join(FIXTURE_DIR, "*.html"))):
+        with open(path, encoding="utf-8") as f:
+            out[os.path.basename(path)] = f.read()
+    return out
+
+
+def similarity(a: str, b: str) -> float:
+    la = [x.strip() for x in a.splitlines() if x.strip()]
+    lb = [x.strip() for x in b.splitlines() if x.strip()]
+    if not la and not lb:
+        return 1.0
+    return difflib.SequenceMatcher(None, la, lb, autojunk=False).ratio()
+
+
+def _run(backend: str, html: str) -> str:
+    if backend == "reference":
+        return reference_extract(html)
+    return extract_main_text(html, backend)
+
+
+def bench_backend(backend: str, fixtures: dict, n: int) -> dict:
+    rows = {}
+    for name, html in fixtures.items():
+        _run(backend, html)  # warm-up
+        times = []
+        for _ in range(n):
+            t0 = time.perf_counter()
+            _run(backend, html)
+            times.append((time.perf_counter() - t0) * 1000)
+
+        tracemalloc.start()
+        text = _run(backend, html)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        ref = _normalize_ws(reference_extract(html))
+        out = _normalize_ws(text)
+        rows[name] = {
+            "ms": statistics.median(times),
+            "py_peak_kb": peak / 1024,
+            "chars": len(out),
+            "quality": similarity(out, ref),
+        }
+    return rows
+
+
+def main(argv):
+    n = 20
+    if "-n" in argv:
+        i = argv.index("-n")
+        n = int(argv[i + 1])
+        argv = argv[:i] + argv[i + 2:]
+
+    backends = ["reference"] + (argv or available_backends())
+    fixtures = load_fixtures()
+    if not fixtures:
+        print(f"找不到 fixture：{FIXTURE_DIR}/*.html")
+        return
+
+    total_kb = sum(len(h.encode("utf-8")) for h in fixtures.values()) / 1024
+    print(f"fixtures: {len(fixtures)} 檔，共 {total_kb:.0f} KB；每檔重複 {n} 次\n")
+    print(f"{'backend':<12}{'fixture':<22}{'ms(p50)':>9}{'py_peak':>10}{'chars':>8}{'quality':>9}")
+
+    summary = []
+    for be in backends:
+        rows = bench_backend(be, fixtures, n)
+        for name, r in rows.items():
+            print(f"{be:<12}{name:<22}{r['ms']:>9.2f}{r['py_peak_kb']:>8.0f}KB{r['chars']:>8}{r['quality']:>9.3f}")
+        total_ms = sum(r["ms"] for r in rows.values())
+        avg_q = statistics.mean(r["quality"] for r in rows.values())
+        max_peak = max(r["py_peak_kb"] for r in rows.values())
+        summary.append((be, total_ms, max_peak, avg_q))
+        print()
+
+    base_ms = summary[0][1]
+    print(f"{'backend':<12}{'total ms':>10}{'speedup':>9}{'py_peak':>10}{'quality':>9}")
+    for be, total_ms, peak, q in summary:
+        print(f"{be:<12}{total_ms:>10.2f}{base_ms / total_ms:>8.1f}x{peak:>8.0f}KB{q:>9.3f}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
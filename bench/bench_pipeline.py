@@ -0,0 +1,371 @@
+# bench/bench_pipeline.py（RAG 全流程離線基準測試：錄製好的 fixture + 本機替身，不連任何外部服務）
+#
+# 用法（在專案根目錄）：
+#   python bench/bench_pipeline.py                         # 冷快取，每個查詢跑 20 次
+#   python bench/bench_pipeline.py -n 50 --warm            # 不清快取（量熱路徑）
+#   python bench/bench_pipeline.py --net-ms 80 --llm-ms 1500   # 模擬網路 / 模型延遲
+#   python bench/bench_pipeline.py --json out.json         # 存結果
+#   python bench/bench_pipeline.py --baseline out.json     # 與上次結果比較，退步超過 --tolerance 就 exit 1
+#
+# - 外部 HTTP（FinMind / Google News RSS / 新聞網站）：在共用 Session 上掛 FixtureAdapter，從 bench/fixtures 回應
+# - OpenAI：以 FakeOpenAI 取代 summarize.client，回傳 bench/fixtures/openai/chat_completion.json
+# - 各階段耗時：包裝 rag / summarize 模組內的函式（identify、price、news、merge、fulltext、assemble、postprocess）
+# - 記憶體：另跑幾輪開 tracemalloc，回報單次請求的峰值與主要配置位置（不影響計時那一輪）
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+import zlib
+from collections import Counter, defaultdict
+from functools import wraps
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(ROOT, "bench", "fixtures")
+sys.path.insert(0, ROOT)
+
+# 必須在 import config 之前設定：不需要真的金鑰，也不寫任何本機快取檔 / 不啟動背景執行緒
+for _k in ("LINE_CHANNEL_SECRET", "LINE_CHANNEL_ACCESS_TOKEN", "OPENAI_API_KEY", "FINMIND_API_KEY"):
+    os.environ.setdefault(_k, "bench")
+os.environ["CACHE_DB_PATH"] = ""
+os.environ["STOCK_SNAPSHOT_PATH"] = ""
+os.environ["NEWS_INGEST_INTERVAL"] = "0"
+os.environ["FINMIND_REQUESTS_PER_HOUR"] = "0"  # 每輪清快取都會重打 FinMind fixture，不做本機限流
+
+import requests  # noqa: E402
+from requests.adapters import BaseAdapter  # noqa: E402
+from requests.structures import CaseInsensitiveDict  # noqa: E402
+from requests.utils import get_encoding_from_headers  # noqa: E402
+
+import rag  # noqa: E402
+import summarize  # noqa: E402
+from config import REPLY_BUDGET_SECONDS  # noqa: E402
+from retrievers import cache as source_cache  # noqa: E402
+from retrievers import fulltext, http_client, ingest  # noqa: E402
+from retrievers.deadline import Deadline  # noqa: E402
+from retrievers.logs import setup_logging  # noqa: E402
+
+QUERIES = [
+    "台積電會漲嗎",
+    "2317 最新消息",
+    "聯發科為什麼跌",
+    "台積店",            # 錯字 → 模糊比對
+    "鴻海跟台積電誰比較好",
+]
+
+STAGES = [
+    ("identify", rag, "smart_identify_company"),
+    ("price", rag, "get_price_with_cache"),
+    ("news.finmind", rag, "get_news_with_cache"),
+    ("news.rss", rag, "fetch_news_rss"),
+    ("merge", rag, "merge_news"),
+    ("fulltext", rag, "lazy_fulltext_topk"),
+    ("assemble", rag, "assemble_context"),
+    ("postprocess", summarize, "postprocess_answer"),
+]
+
+
+# ---------------------------------------------------------
+# 本機替身：HTTP
+# ---------------------------------------------------------
+def _read(*parts) -> bytes:
+    with open(os.path.join(FIXTURES, *parts), "rb") as f:
+        return f.read()
+
+
+class FixtureAdapter(BaseAdapter):
+    """依 URL 從 bench/fixtures 回應；net_ms 模擬每個請求的網路延遲"""
+
+    EMPTY_FINMIND = json.dumps({"msg": "success", "status": 200, "data": []}).encode()
+    EMPTY_RSS = b'<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel></channel></rss>'
+
+    def __init__(self, net_ms: float = 0.0):
+        super().__init__()
+        self.net_ms = net_ms
+        self.counts: Counter = Counter()
+        self._lock = threading.Lock()
+        html_dir = os.path.join(FIXTURES, "html")
+        self._html = [_read("html", name) for name in sorted(os.listdir(html_dir)) if name.endswith(".html")]
+
+    def _route(self, url: str):
+        p = urlparse(url)
+        qs = {k: v[0] for k, v in parse_qs(p.query).items()}
+        if p.netloc == "api.finmindtrade.com":
+            dataset = qs.get("dataset", "")
+            if dataset == "TaiwanStockInfo":
+                return "application/json", _read("finmind", "TaiwanStockInfo.json")
+            path = os.path.join(FIXTURES, "finmind", dataset, f"{qs.get('data_id', '')}.json")
+            return "application/json", (_read(path) if os.path.exists(path) else self.EMPTY_FINMIND)
+        if p.netloc == "news.google.com":
+            sid = next((w for w in qs.get("q", "").split() if w.isdigit()), "")
+            path = os.path.join(FIXTURES, "rss", f"{sid}.xml")
+            return "application/rss+xml; charset=utf-8", (_read(path) if os.path.exists(path) else self.EMPTY_RSS)
+        # 其他一律當新聞文章：依 URL 固定對應到某個 HTML fixture
+        return "text/html; charset=utf-8", self._html[zlib.crc32(url.encode()) % len(self._html)]
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        host = urlparse(request.url).netloc
+        with self._lock:
+            self.counts[host] += 1
+        if self.net_ms:
+            time.sleep(self.net_ms / 1000)
+        ctype, body = self._route(request.url)
+
+        resp = requests.Response()
+        resp.status_code = 200
+        resp.headers = CaseInsensitiveDict({"Content-Type": ctype, "Content-Length": str(len(body))})
+        resp.encoding = get_encoding_from_headers(resp.headers)
+        resp.raw = io.BytesIO(body)
+        resp.url = request.url
+        resp.request = request
+        resp.reason = "OK"
+        return resp
+
+    def close(self):
+        pass
+
+
+# ---------------------------------------------------------
+# 本機替身：OpenAI
+# ---------------------------------------------------------
+def _to_ns(obj):
+    if isinstance(obj, dict):
+        return SimpleNamespace(**{k: _to_ns(v) for k, v in obj.items()})
+    if isinstance(obj, list):
+        return [_to_ns(v) for v in obj]
+    return obj
+
+
+class FakeOpenAI:
+    """只實作 client.chat.completions.create；回傳錄製好的 completion"""
+
+    def __init__(self, llm_ms: float = 0.0):
+        self.llm_ms = llm_ms
+        self.calls = 0
+        self._payload = json.loads(_read("openai", "chat_completion.json"))
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        self.calls += 1
+        if self.llm_ms:
+            time.sleep(self.llm_ms / 1000)
+        return _to_ns(self._payload)
+
+
+# ---------------------------------------------------------
+# 計時
+# ---------------------------------------------------------
+class StageTimer:
+    def __init__(self):
+        self.samples = defaultdict(list)  # stage -> [ms, ...]
+        self.enabled = True  # 暖機 / tracemalloc 那幾輪不記錄
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, ms: float):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.samples[stage].append(ms)
+
+    def wrap(self, stage: str, fn):
+        @wraps(fn)
+        def timed(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.record(stage, (time.perf_counter() - t0) * 1000)
+        return timed
+
+
+def percentile(values, p: float) -> float:
+    """線性內插百分位數（p 介於 0~100）"""
+    if not values:
+        return 0.0
+    xs = sorted(values)
+    k = (len(xs) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(xs) - 1)
+    return xs[lo] + (xs[hi] - xs[lo]) * (k - lo)
+
+
+def summarize_samples(samples) -> dict:
+    return {
+        stage: {
+            "n": len(v),
+            "mean": statistics.mean(v),
+            "p50": percentile(v, 50),
+            "p95": percentile(v, 95),
+            "p99": percentile(v, 99),
+        }
+        for stage, v in samples.items() if v
+    }
+
+
+# ---------------------------------------------------------
+# 執行
+# ---------------------------------------------------------
+def clear_caches():
+    for c in (rag.CACHE, source_cache.PRICE_CACHE, source_cache.NEWS_CACHE,
+              fulltext._FULLTEXT_CACHE, summarize.ANSWER_CACHE, ingest.INGEST_STORE):
+        c.clear()
+
+
+def run_once(query: str, timer: StageTimer):
+    t0 = time.perf_counter()
+    deadline = Deadline(REPLY_BUDGET_SECONDS)
+    context = rag.build_context(query, deadline=deadline)
+    answer = summarize.summarize_with_gpt(query, context, deadline=deadline)
+    timer.record("e2e", (time.perf_counter() - t0) * 1000)
+    return answer
+
+
+def setup(net_ms: float, llm_ms: float):
+    adapter = FixtureAdapter(net_ms)
+    for retry in (True, False):  # FinMind 走不重試的 Session
+        session = http_client.get_session(retry)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+    fake = FakeOpenAI(llm_ms)
+    summarize.client = fake
+
+    source_cache.get_finmind_data()  # 經 FixtureAdapter 載入 TaiwanStockInfo
+    rag.refresh_stock_map()
+    if not rag.is_ready():
+        raise SystemExit("股票清單載入失敗，請檢查 bench/fixtures/finmind/TaiwanStockInfo.json")
+
+    timer = StageTimer()
+    for stage, module, name in STAGES:
+        setattr(module, name, timer.wrap(stage, getattr(module, name)))
+    return adapter, fake, timer
+
+
+def measure_allocations(runs: int, warm: bool) -> dict:
+    """
+    開 tracemalloc 另跑幾輪：單次請求的 Python heap 峰值，
+    以及跑完後仍存活、配置在專案程式碼中的前幾名位置（快取 / 模組狀態；數字持續變大代表有洩漏）。
+    """
+    peaks = []
+    tracemalloc.start(10)
+    for _ in range(runs):
+        for q in QUERIES:
+            if not warm:
+                clear_caches()
+            tracemalloc.reset_peak()
+            base, _ = tracemalloc.get_traced_memory()
+            run_once(q, StageTimer())  # 只要 e2e 峰值，不記階段耗時
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append((peak - base) / 1024)
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    repo_filter = tracemalloc.Filter(True, os.path.join(ROOT, "*"))
+    bench_filter = tracemalloc.Filter(False, os.path.join(ROOT, "bench", "*"))
+    stats = snapshot.filter_traces([repo_filter, bench_filter]).statistics("lineno")
+    top = [
+        {"where": f"{os.path.relpath(s.traceback[0].filename, ROOT)}:{s.traceback[0].lineno}",
+         "kb": s.size / 1024, "count": s.count}
+        for s in stats[:8]
+    ]
+    return {"peak_kb_p50": percentile(peaks, 50), "peak_kb_max": max(peaks) if peaks else 0.0, "top": top}
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> list:
+    """p50 / p95 比 baseline 慢超過 tolerance（且差距 > 1ms）就列為退步"""
+    regressions = []
+    for stage, cur in result["stages"].items():
+        old = baseline.get("stages", {}).get(stage)
+        if not old:
+            continue
+        for key in ("p50", "p95"):
+            if cur[key] > old[key] * (1 + tolerance) and cur[key] - old[key] > 1.0:
+                regressions.append(f"{stage}.{key}: {old[key]:.2f} → {cur[key]:.2f} ms")
+    return regressions
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="RAG pipeline offline benchmark")
+    ap.add_argument("-n", type=int, default=20, help="每個查詢跑幾次")
+    ap.add_argument("--warm", action="store_true", help="不清快取（量快取命中路徑）")
+    ap.add_argument("--net-ms", type=float, default=0.0, help="每個 HTTP 請求模擬延遲（ms）")
+    ap.add_argument("--llm-ms", type=float, default=0.0, help="OpenAI 呼叫模擬延遲（ms）")
+    ap.add_argument("--alloc-runs", type=int, default=2, help="tracemalloc 量測輪數（0 = 不量）")
+    ap.add_argument("--json", help="把結果寫入 JSON 檔")
+    ap.add_argument("--baseline", help="與之前的 JSON 結果比較")
+    ap.add_argument("--tolerance", type=float, default=0.2, help="允許的退步比例（預設 20%%）")
+    ap.add_argument("-v", "--verbose", action="store_true", help="顯示流程 LOG")
+    args = ap.parse_args(argv)
+
+    if args.verbose:
+        setup_logging("DEBUG")
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+    with quiet:
+        adapter, fake, timer = setup(args.net_ms, args.llm_ms)
+        timer.enabled = False
+        for q in QUERIES:  # 暖機：延遲載入的東西（tiktoken、regex 編譯等）不算進結果
+            clear_caches()
+            run_once(q, timer)
+        timer.enabled = True
+        adapter.counts.clear()
+        fake.calls = 0
+
+        for _ in range(args.n):
+            for q in QUERIES:
+                if not args.warm:
+                    clear_caches()
+                run_once(q, timer)
+        requests_by_host = dict(adapter.counts)
+        llm_calls = fake.calls
+        timer.enabled = False
+        alloc = measure_allocations(args.alloc_runs, args.warm) if args.alloc_runs > 0 else None
+
+    stages = summarize_samples(timer.samples)
+    total_runs = args.n * len(QUERIES)
+    print(f"queries={len(QUERIES)} × n={args.n}（{'warm' if args.warm else 'cold'} cache，net={args.net_ms}ms，llm={args.llm_ms}ms）\n")
+    print(f"{'stage':<14}{'n':>6}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}   (ms)")
+    for stage in [s for s, _, _ in STAGES] + ["e2e"]:
+        r = stages.get(stage)
+        if r:
+            print(f"{stage:<14}{r['n']:>6}{r['mean']:>10.2f}{r['p50']:>10.2f}{r['p95']:>10.2f}{r['p99']:>10.2f}")
+
+    print("\nHTTP 請求（每次查詢平均）：" + "，".join(
+        f"{h} {c / total_runs:.1f}" for h, c in sorted(requests_by_host.items())) + f"；OpenAI {llm_calls / total_runs:.2f}")
+    if alloc:
+        print(f"\n單次請求 Python heap 峰值：p50 {alloc['peak_kb_p50']:.0f} KB，max {alloc['peak_kb_max']:.0f} KB")
+        print("跑完後仍存活的配置（專案程式碼，前幾名）：")
+        for t in alloc["top"]:
+            print(f"  {t['kb']:>9.1f} KB {t['count']:>7} blocks  {t['where']}")
+
+    result = {
+        "config": {"n": args.n, "warm": args.warm, "net_ms": args.net_ms, "llm_ms": args.llm_ms, "queries": QUERIES},
+        "stages": stages,
+        "requests_per_query": {h: c / total_runs for h, c in requests_by_host.items()},
+        "allocations": alloc,
+    }
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"\n結果已寫入 {args.json}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.tolerance)
+        if regressions:
+            print(f"\n❌ 與 {args.baseline} 相比退步超過 {args.tolerance:.0%}：")
+            for r in regressions:
+                print(f"  {r}")
+            return 1
+        print(f"\n✅ 與 {args.baseline} 相比沒有超過 {args.tolerance:.0%} 的退步")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
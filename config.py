@@ -20,4 +20,73 @@ if not all([LINE_CHANNEL_SECRET, LINE_CHANNEL_ACCESS_TOKEN, OPENAI_API_KEY, FINM
     raise ValueError("警告：缺少必要 API 金鑰（LINE / OpenAI / FinMind），請檢查你的 .env 檔案。")
 
 # (可選) 增加時區設定，方便未來使用
-TZ = "Asia/Taipei"
\ No newline at end of file
+TZ = "Asia/Taipei"
+
+# --- 回覆時間預算 ---
+# 從 LINE 事件時間起算的總預算（秒）；時間不夠時依序略過全文 → 略過 RSS → 縮短 GPT 輸出
+REPLY_BUDGET_SECONDS = float(os.getenv("REPLY_BUDGET_SECONDS", "25"))
+
+# --- Context token 預算 ---
+# rag.py 組 context 時依排名刪減全文摘錄與新聞條目，讓 context 不超過此 token 數
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1600"))
+
+# --- 持久化快取（可選）---
+# 設定 SQLite 檔案路徑後，股票清單 / 新聞 / 全文摘錄會寫入磁碟，重啟後直接沿用（仍套用原本 TTL）。
+CACHE_DB_PATH = os.getenv("CACHE_DB_PATH", "")
+
+# --- 多 worker 共用快取（可選，gunicorn 多 worker 時建議開啟）---
+# sqlite:///.cache/shared.sqlite3：同一台主機的 worker 共用一個 SQLite 檔，背景刷新以檔案鎖選出一個 worker 執行
+# redis://host:6379/0：任何 Redis 相容服務（需 pip install redis），背景刷新以 SET NX lease 選主
+# 設定後股價 / 新聞 / 全文 / 查詢結果 / 回答快取都跨 worker 共用（優先於 CACHE_DB_PATH）
+SHARED_CACHE_URL = os.getenv("SHARED_CACHE_URL", "")
+
+# --- 全文萃取 ---
+# HTML 解析後端：auto（預設，selectolax → lxml → bs4 依序取第一個已安裝的）/ selectolax / lxml / bs4
+FULLTEXT_PARSER = os.getenv("FULLTEXT_PARSER", "auto")
+
+# --- 新聞近似重複去除 ---
+# 標題（或摘要）MinHash 相似度 ≥ 此值視為同一則新聞，只保留一則；正規化後標題完全相同者一律去除
+# （MinHash 為估計值：1.0 只會併掉詞組幾乎完全一致的標題，並非逐字比對）
+NEWS_DEDUP_THRESHOLD = float(os.getenv("NEWS_DEDUP_THRESHOLD", "0.7"))
+
+# 股票清單本機快照：啟動時同步讀取（毫秒級），FinMind 最新清單改由背景執行緒更新
+STOCK_SNAPSHOT_PATH = os.getenv("STOCK_SNAPSHOT_PATH", ".cache/stock_info.json")
+
+# --- 熱門代號預熱 ---
+# 背景執行緒定期刷新最常被查詢的前 N 檔股價/新聞，讓熱門代號永遠不走冷路徑（N=0 關閉）
+HOT_TICKERS_TOP_N = int(os.getenv("HOT_TICKERS_TOP_N", "20"))
+HOT_REFRESH_INTERVAL = int(os.getenv("HOT_REFRESH_INTERVAL", "60"))
+# 每輪最多刷新幾項（股價、新聞各算一項），避免預熱吃光 FinMind 額度；排名前面的先刷
+HOT_REFRESH_MAX_PER_ROUND = int(os.getenv("HOT_REFRESH_MAX_PER_ROUND", "5"))
+
+# --- 背景新聞收錄（可選）---
+# 每 NEWS_INGEST_INTERVAL 秒抓一次觀察清單（逗號分隔代號；留空則用熱門前 HOT_TICKERS_TOP_N 檔）的新聞與全文，
+# 這些代號查詢時直接用本機收錄結果，不再即時抓新聞（0 = 關閉）
+NEWS_INGEST_INTERVAL = int(os.getenv("NEWS_INGEST_INTERVAL", "0"))
+NEWS_INGEST_WATCHLIST = [t.strip() for t in os.getenv("NEWS_INGEST_WATCHLIST", "").split(",") if t.strip()]
+
+# --- FinMind 額度 ---
+# 所有 FinMind 請求經 retrievers/finmind.py 的 token bucket 限流：每小時上限依方案設定（0 = 不限流），
+# BURST 為可瞬間連發的請求數；背景刷新會保留額度給使用者查詢。多 worker 各自限流，請依 worker 數分配。
+FINMIND_REQUESTS_PER_HOUR = int(os.getenv("FINMIND_REQUESTS_PER_HOUR", "600"))
+FINMIND_BURST = int(os.getenv("FINMIND_BURST", "20"))
+
+# --- 全市場股價表（可選，需 FinMind 方案支援不帶 data_id 的全市場查詢）---
+# 開啟後背景定期抓最近兩個交易日的全市場收盤價，股價查詢改為記憶體 O(1) 查表
+# 表超過 3 個刷新週期未更新（刷新持續失敗）時，股價查詢改回逐檔查詢
+PRICE_BULK_MODE = os.getenv("PRICE_BULK_MODE", "0").lower() in ("1", "true", "yes")
+PRICE_TABLE_REFRESH = int(os.getenv("PRICE_TABLE_REFRESH", "600"))
+
+# --- Logging ---
+# LOG_LEVEL：DEBUG / INFO（預設）/ WARNING；LOG_FORMAT：text（預設）或 json（每行一筆，方便送進 log 平台）
+# LOG_DEBUG_SAMPLE_RATE：DEBUG 等級下逐筆明細（每則新聞標題、每組近似重複）只輸出此比例
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.1"))
+
+# --- Webhook 非同步處理（可選）---
+# 開啟後 /callback 驗完簽章就立即回 200，事件交給背景 worker 處理；
+# reply token 過期時改用 push API 回覆。
+WEBHOOK_ASYNC = os.getenv("WEBHOOK_ASYNC", "0").lower() in ("1", "true", "yes")
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "4"))
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "100"))
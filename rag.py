@@ -1,15 +1,33 @@
 # rag.py（含完整 LOG 版 + 支援背景刷新重新載入）
+import contextvars
+import logging
 import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from retrievers import cache as source_cache
 from retrievers.cache import (
     load_stock_map_from_cache,
     get_price_with_cache,
     get_news_with_cache,
+    record_query,
 )
 from retrievers.news import fetch_news_rss
 from retrievers.merge_utils import merge_news
 from retrievers.fulltext import lazy_fulltext_topk
+from retrievers.ingest import get_ingested, start_news_ingest
+from retrievers.company_index import CompanyIndex
+from retrievers.http_client import pool_stats
+from retrievers import metrics
+from retrievers.logs import bind as bind_log_fields, get_logger
+from retrievers.ttl_cache import TTLCache
+from retrievers.persist import lazy_shared_store
+from retrievers.singleflight import SingleFlight
+from retrievers.deadline import Deadline
+from retrievers.tokens import count_tokens
+from config import CONTEXT_TOKEN_BUDGET
 from urllib.parse import urlparse, urlunparse
 
+log = get_logger("rag")
+
 def normalize_url(url: str) -> str:
     """把 URL 正規化：http->https、移除空白、修正特定網域、處理解析失敗"""
     if not url:
@@ -50,14 +68,92 @@ def looks_like_article(url: str) -> bool:
         return False
 
 
-# === 股票代號對照表 ===
-print("[RAG/Init] 🧭 載入 FinMind 股票代號清單中...")
-STOCK_MAP = load_stock_map_from_cache()
-print(f"[RAG/Init] ✅ 已載入 {len(STOCK_MAP)//2} 檔股票代號。")
+# === 股票代號對照表（由 startup() 載入，import 時不做任何 I/O）===
+STOCK_MAP = {}
+STOCK_INDEX = CompanyIndex(STOCK_MAP)
+
+NOT_READY_MESSAGE = "抱歉，系統正在載入股票清單，請稍後再試一次。"
 
 # === 使用者查詢快取 ===
-CACHE = {}
 CACHE_DURATION_SECONDS = 120
+CACHE = TTLCache(
+    "rag_query", ttl=CACHE_DURATION_SECONDS, max_entries=1000, max_bytes=8 * 1024 * 1024,
+    backend=lazy_shared_store(),  # SHARED_CACHE_URL 有設定時各 worker 共用
+)
+_QUERY_FLIGHT = SingleFlight("rag_query")  # 同一句查詢同時只組一次 context
+
+# === 並行檢索（股價 / FinMind 新聞 / RSS 同時抓，延遲取決於最慢的來源）===
+RETRIEVAL_TIMEOUTS = {
+    "price": 8,          # 秒
+    "finmind_news": 12,  # 秒（可能打兩次 API：代號 + 名稱）
+    "rss": 10,           # 秒
+}
+_RETRIEVAL_POOL = ThreadPoolExecutor(max_workers=12, thread_name_prefix="rag-retrieval")
+# 時間預算再緊也至少等這麼久：快取命中的結果幾毫秒內就會回來，不該因為預算見底就整個丟掉
+RETRIEVAL_MIN_WAIT_SECONDS = 0.5
+# 逾時來源寫進證據層級「略過」清單時的名稱
+_SOURCE_NAMES = {"price": "股價", "finmind_news": "FinMind 新聞", "rss": "Google RSS"}
+
+# === 時間預算降級門檻（秒，指當下剩餘時間）===
+# 降級順序固定：先略過全文 → 再略過 RSS → 最後由 summarize 縮短 max_tokens
+GPT_RESERVE_SECONDS = 10    # 保留給 GPT 生成的時間
+FULLTEXT_MIN_SECONDS = 14   # 檢索完成後剩餘時間低於此值就略過全文
+RSS_MIN_SECONDS = 12        # 開始檢索時剩餘時間低於此值就略過 RSS
+FULLTEXT_DEADLINE_SECONDS = 6
+
+# 證據層級（寫進 context 最後一行，summarize 會據此在回覆中註明本次用了哪些證據）
+EVIDENCE_TIERS_PREFIX = "[證據層級]"
+
+
+def _submit(stage: str, fn, *args):
+    """丟進檢索 pool：記錄 stage 耗時，並沿用呼叫端的 log 欄位（request_id / ticker），另加上 stage"""
+    ctx = contextvars.copy_context()
+    ctx.run(bind_log_fields, stage=stage)
+    return _RETRIEVAL_POOL.submit(ctx.run, metrics.call_with_span, stage, fn, *args)
+
+
+def _wait_result(future, label: str, started_at: float, default, deadline: Deadline = None, skipped=None):
+    """
+    等待單一來源結果；逾時或例外一律降級為 default（與各 fetcher 失敗時回傳 []/None 一致）。
+    時間預算只會把等待縮短到 RETRIEVAL_MIN_WAIT_SECONDS；逾時的來源會加進 skipped（證據層級註明略過）。
+    """
+    remaining = RETRIEVAL_TIMEOUTS[label] - (time.time() - started_at)
+    if deadline is not None:
+        budget = deadline.remaining() - GPT_RESERVE_SECONDS
+        remaining = min(remaining, max(budget, RETRIEVAL_MIN_WAIT_SECONDS))
+    try:
+        return future.result(timeout=max(0.0, remaining))
+    except FutureTimeoutError:
+        metrics.inc("stage_timeouts_total", stage=label)
+        log.warning("[RAG/Retrieve] ⏱️ %s 等待 %.1f 秒未回應，改用空結果。", label, max(0.0, remaining))
+        if skipped is not None:
+            skipped.append(_SOURCE_NAMES.get(label, label))
+    except Exception as e:
+        log.warning("[RAG/Retrieve] ⚠️ %s 檢索失敗：%s，改用空結果。", label, e)
+    return default
+
+
+# ---------------------------------------------------------
+# 啟動 / Readiness
+# ---------------------------------------------------------
+def startup() -> bool:
+    """
+    應用啟動時呼叫一次：同步載入本機股票清單快照並建立名稱索引，
+    FinMind 最新清單由背景執行緒更新（完成後會呼叫 refresh_stock_map）。
+    """
+    print("[RAG/Init] 🧭 載入股票代號清單（本機快照）...")
+    ready = source_cache.startup()
+    if ready:
+        refresh_stock_map()
+    else:
+        print("[RAG/Init] ⏳ 尚無本機快照，等待背景刷新完成後即可服務。")
+    start_news_ingest()
+    return ready
+
+
+def is_ready() -> bool:
+    """有可用的股票清單與名稱索引時回傳 True"""
+    return len(STOCK_INDEX) > 0
 
 
 # ---------------------------------------------------------
@@ -65,71 +161,180 @@ CACHE_DURATION_SECONDS = 120
 # ---------------------------------------------------------
 def smart_identify_company(query: str):
     q = query.strip().upper()
-    print(f"[RAG/Identify] 🔍 嘗試辨識公司：'{q}'")
+    index = STOCK_INDEX  # 取一次快照，背景刷新替換索引時不受影響
+    log.debug("[RAG/Identify] 🔍 嘗試辨識公司：'%s'", q)
 
     # 完全命中（名稱或代號）
-    if q in STOCK_MAP:
-        print(f"[RAG/Identify] ✅ 完全命中 STOCK_MAP → {q} → {STOCK_MAP[q]}")
-        return STOCK_MAP[q], q
+    if q in index.stock_map:
+        log.debug("[RAG/Identify] ✅ 完全命中 STOCK_MAP → %s → %s", q, index.stock_map[q])
+        return index.stock_map[q], q
+
+    # 片段比對（Aho-Corasick 單次掃描，取最長的名稱）
+    matches = index.find_all(q)
+    if matches:
+        name, code = matches[0]
+        if len(matches) > 1:
+            log.debug("[RAG/Identify] 🔍 共偵測到 %d 個候選：%s", len(matches), [m[0] for m in matches[:5]])
+        log.debug("[RAG/Identify] 🔍 偵測到公司名稱片段 → %s", name)
+        return code, name
+
+    # 錯字容錯（字元 n-gram 倒排索引 + 編輯距離），只在前兩步都失敗時才跑
+    fuzzy = index.fuzzy_find(q)
+    if fuzzy:
+        name, code, sim = fuzzy[0]
+        log.info("[RAG/Identify] 🔤 模糊比對 → %s（相似度 %s；候選：%s）", name, sim, [m[0] for m in fuzzy])
+        return code, name
+
+    log.info("[RAG/Identify] ❌ 找不到匹配的公司 → '%s'", q)
+    return None, None
 
-    # 模糊比對
-    for name in STOCK_MAP.keys():
-        if len(name) >= 2 and name in q:
-            print(f"[RAG/Identify] 🔍 偵測到公司名稱片段 → {name}")
-            return STOCK_MAP[name], name
 
-    print(f"[RAG/Identify] ❌ 找不到匹配的公司 → '{q}'")
-    return None, None
+# ---------------------------------------------------------
+# Context 組裝（依 token 預算刪減）
+# ---------------------------------------------------------
+def assemble_context(price_line: str, news_lines, ft_map, token_budget: int = CONTEXT_TOKEN_BUDGET):
+    """
+    依 token 預算組裝 context 各行。
+    - news_lines：[(編號, 來源行), ...]，依合併後排名排列（編號越小越重要）
+    - ft_map：{編號: [摘錄1, 摘錄2, ...]}
+    超過預算時依序刪減：
+      1) 全文摘錄：先刪各篇的「摘錄2」再刪「摘錄1」，同層級從排名最後的文章開始
+      2) 新聞條目：從排名最後開始刪，有摘錄的條目最後才刪（連同其摘錄）
+    股價資訊永遠保留；新聞至少保留 1 則。
+    回傳 (ctx_lines, 保留的摘錄 {編號: [...]}, 原始 token 數, 最終 token 數)
+    """
+    news = [(idx, line, count_tokens(line)) for idx, line in news_lines]
+    snippets = [
+        (idx, j, f"[{idx}] 摘錄{j}: {s}")
+        for idx in sorted(ft_map)
+        for j, s in enumerate(ft_map[idx], start=1)
+    ]
+    snippets = [(idx, j, line, count_tokens(line)) for idx, j, line in snippets]
+    fixed = count_tokens(price_line) if price_line else 0
+    header_cost = 20  # 兩個段落標題約略 token 數
+
+    def total():
+        return fixed + header_cost + sum(n[2] for n in news) + sum(s[3] for s in snippets)
+
+    original = total()
+
+    # 1) 刪摘錄：摘錄序號大的先刪，同序號從排名最後的文章開始
+    for victim in sorted(snippets, key=lambda s: (s[1], s[0]), reverse=True):
+        if total() <= token_budget:
+            break
+        snippets.remove(victim)
+
+    # 2) 刪新聞條目：從最後開始，有摘錄的留到最後
+    def drop_order():
+        with_snip = {s[0] for s in snippets}
+        plain = [n for n in reversed(news) if n[0] not in with_snip]
+        return plain + [n for n in reversed(news) if n[0] in with_snip]
+
+    while total() > token_budget and len(news) > 1:
+        victim = drop_order()[0]
+        news.remove(victim)
+        snippets = [s for s in snippets if s[0] != victim[0]]
+
+    ctx_lines = []
+    if price_line:
+        ctx_lines.append(price_line)
+    if news:
+        ctx_lines.append("[新聞來源 (請用 [編號] 引用)]")
+        ctx_lines.extend(line for _, line, _ in news)
+    kept_ft = {}
+    if snippets:
+        ctx_lines.append("")
+        ctx_lines.append("[全文摘錄 (Top3，仍請用相同 [編號] 引用)]")
+        for idx, j, line, _ in snippets:
+            ctx_lines.append(line)
+            kept_ft.setdefault(idx, []).append(ft_map[idx][j - 1])
+    return ctx_lines, kept_ft, original, total()
 
 
 # ---------------------------------------------------------
 # 主流程：組合 context
 # ---------------------------------------------------------
-def build_context(query: str):
+def build_context(query: str, deadline: Deadline = None):
+    """
+    組合 RAG context。deadline（可選）為整個請求的時間預算；
+    時間不夠時會略過全文/RSS，且降級結果不寫入快取。
+    """
     user_text = query.strip()
-    now = time.time()
-    print(f"[RAG/Query] 🚀 收到使用者查詢：「{user_text}」")
+    log.info("[RAG/Query] 🚀 收到使用者查詢：「%s」", user_text)
 
-    # --- 快取檢查 ---
-    if user_text in CACHE and now < CACHE[user_text]['expires_at']:
-        print(f"[RAG/Cache] ✅ 使用快取資料 → '{user_text}'（剩餘 {int(CACHE[user_text]['expires_at'] - now)} 秒）")
-        return CACHE[user_text]['data']
-    print(f"[RAG/Cache] ❌ 快取未命中，開始查詢資料 → '{user_text}'\n")
+    with metrics.span("build_context"):
+        # --- 快取檢查 ---
+        cached = CACHE.get(user_text)
+        if cached is not None:
+            log.info("[RAG/Cache] ✅ 使用快取資料 → '%s'（剩餘 %d 秒）", user_text, CACHE.ttl_remaining(user_text))
+            return cached
+        log.debug("[RAG/Cache] ❌ 快取未命中，開始查詢資料 → '%s'", user_text)
+        return _QUERY_FLIGHT.do(user_text, _build_context_uncached, user_text, deadline)
+
+
+def _build_context_uncached(user_text: str, deadline: Deadline = None):
+    if not is_ready():
+        log.warning("[RAG/Query] ⏳ 股票清單尚未載入，暫時無法處理查詢。")
+        return NOT_READY_MESSAGE
 
     # --- 公司辨識 ---
-    ticker_id, company_name = smart_identify_company(user_text)
+    with metrics.span("identify"):
+        ticker_id, company_name = smart_identify_company(user_text)
     if not ticker_id:
-        print(f"[RAG/Query] ❌ 查無公司 '{user_text}'，終止流程。")
+        log.info("[RAG/Query] ❌ 查無公司 '%s'，終止流程。", user_text)
         return f"抱歉，找不到與「{user_text}」相關的公司，請確認名稱或代號是否正確。"
-    print(f"[RAG/Query] ✅ 公司辨識完成：{company_name}（代號 {ticker_id}）\n")
+    bind_log_fields(ticker=ticker_id)
+    log.info("[RAG/Query] ✅ 公司辨識完成：%s（代號 %s）", company_name, ticker_id)
+    record_query(ticker_id, company_name)
+
+    skipped = []  # 因時間預算略過的證據層級
+
+    # --- 背景收錄命中：新聞與全文直接用本機資料，只剩股價走快取/即時查詢 ---
+    ingested = get_ingested(ticker_id)
+    if ingested is not None:
+        age = time.time() - ingested.get("updated_at", 0)
+        log.info("[RAG/Ingest] 📦 使用背景收錄新聞 → %s（%d 秒前收錄，全文 %d 篇）", ticker_id, age, len(ingested.get("fulltext") or {}))
+
+    # --- 股價 + 新聞並行檢索（三個來源互不相依）---
+    use_rss = ingested is None and (deadline is None or deadline.remaining() >= RSS_MIN_SECONDS)
+    if ingested is None and not use_rss:
+        skipped.append("Google RSS")
+        log.info("[RAG/Budget] ⏱️ 剩餘 %.1f 秒，略過 Google RSS。", deadline.remaining())
+    started_at = time.time()
+    price_future = _submit("price", get_price_with_cache, ticker_id)
+    finmind_future = rss_future = None
+    if ingested is None:
+        log.debug("[RAG/Retrieve] 🚀 並行查詢股價與新聞 → %s（FinMind 股價 + FinMind 新聞%s）", ticker_id, " + Google RSS" if use_rss else "")
+        finmind_future = _submit("finmind_news", get_news_with_cache, ticker_id, company_name)
+        rss_future = _submit("rss", fetch_news_rss, company_name, ticker_id) if use_rss else None
 
     # --- 股價查詢 ---
-    print(f"[RAG/Price] 💹 開始查詢股價 → {ticker_id}")
-    price = get_price_with_cache(ticker_id)
+    price = _wait_result(price_future, "price", started_at, None, deadline, skipped)
     if price:
-        print(f"[RAG/Price] ✅ 股價結果：{price['price']} ({'+' if price['change']>=0 else ''}{price['change']}, {price['pct']}%)\n")
+        log.debug("[RAG/Price] ✅ 股價結果：%s (%+g, %s%%)", price["price"], price["change"], price["pct"])
     else:
-        print(f"[RAG/Price] ⚠️ 無法取得股價資料。")
+        log.warning("[RAG/Price] ⚠️ 無法取得股價資料。")
 
     # --- 新聞抓取 ---
-    print(f"[RAG/News] 🗞️ 開始抓取新聞 → FinMind + Google RSS")
-    finmind_news = get_news_with_cache(ticker_id, company_name) or []
-    rss_news = fetch_news_rss(company_name, ticker_id) or []
+    if ingested is not None:
+        finmind_news = ingested.get("finmind_news") or []
+        rss_news = ingested.get("rss_news") or []
+    else:
+        finmind_news = _wait_result(finmind_future, "finmind_news", started_at, [], deadline, skipped) or []
+        rss_news = (_wait_result(rss_future, "rss", started_at, [], deadline, skipped) or []) if rss_future else []
+    log.info("[RAG/Retrieve] ✅ 檢索完成，耗時 %.2f 秒（FinMind %d 則 / RSS %d 則）", time.time() - started_at, len(finmind_news), len(rss_news))
 
     # --- 合併新聞 ---
-    print(f"[RAG/NewsMerge] 🔄 準備合併 FinMind 與 RSS 新聞...")
-    merged_news = merge_news(finmind_news, rss_news)
-    print(f"[RAG/NewsMerge] ✅ 合併完成，共 {len(merged_news)} 則。\n")
-
-    # --- 組裝 context ---
-    print(f"[RAG/Context] 🧩 組裝 context 文字內容...")
-    ctx_lines = []
+    with metrics.span("merge"):
+        merged_news = merge_news(finmind_news, rss_news)
 
+    # --- 組裝 context 各行（最後再依 token 預算刪減）---
+    price_line = ""
     if price:
-        ctx_lines.append(f"[股價資訊] {ticker_id} 現價 {price['price']} ({'+' if price['change']>=0 else ''}{price['change']} / {price['pct']}%)")
+        price_line = f"[股價資訊] {ticker_id} 現價 {price['price']} ({'+' if price['change']>=0 else ''}{price['change']} / {price['pct']}%)"
 
+    news_lines = []
     if merged_news:
-        ctx_lines.append("[新聞來源 (請用 [編號] 引用)]")
         for i, n in enumerate(merged_news, start=1):
             title = (n.get("title") or "").strip()
             src = (n.get("source") or "").strip() or "未知來源"
@@ -143,32 +348,63 @@ def build_context(query: str):
             url = norm_url if norm_url else "無連結"
 
             # 這行就是 grounding 的核心：LLM 之後就能用 [i]
-            ctx_lines.append(f"[{i}] {title} | {src} | {dt} | {url}")
+            news_lines.append((i, f"[{i}] {title} | {src} | {dt} | {url}"))
 
     # --- Lazy Full-Text Top3（只抓最相關的 3 篇全文）---
     rank_q = f"{company_name} {ticker_id}"   # 中性：只跟公司有關
     snippet_q = user_text                    # 保留使用者意圖：用來抽段落
-    ft_map = lazy_fulltext_topk(rank_q, snippet_q, merged_news, k=3)
-
-    if ft_map:
-        ctx_lines.append("")
-        ctx_lines.append("[全文摘錄 (Top3，仍請用相同 [編號] 引用)]")
-        for idx in sorted(ft_map.keys()):
-            for j, snippet in enumerate(ft_map[idx], start=1):
-                ctx_lines.append(f"[{idx}] 摘錄{j}: {snippet}")
+    ft_map = {}
+    # 背景收錄已有全文時只是本機抽摘錄，不受時間預算限制
+    if ingested is None and deadline is not None and deadline.remaining() < FULLTEXT_MIN_SECONDS:
+        skipped.append("全文摘錄")
+        log.info("[RAG/Budget] ⏱️ 剩餘 %.1f 秒，略過全文抓取。", deadline.remaining())
+    elif merged_news:
+        ft_deadline = FULLTEXT_DEADLINE_SECONDS
+        if deadline is not None:
+            ft_deadline = deadline.cap(FULLTEXT_DEADLINE_SECONDS, reserve=GPT_RESERVE_SECONDS)
+        with metrics.span("fulltext"):
+            ft_map = lazy_fulltext_topk(
+                rank_q, snippet_q, merged_news, k=3, deadline_s=ft_deadline,
+                texts=ingested.get("fulltext") if ingested is not None else None,
+            )
+
+    with metrics.span("assemble"):
+        ctx_lines, ft_map, tokens_before, tokens_after = assemble_context(price_line, news_lines, ft_map)
+    if tokens_after < tokens_before:
+        log.info("[RAG/Context] ✂️ 依 token 預算（%d）刪減 context：約 %d → %d tokens", CONTEXT_TOKEN_BUDGET, tokens_before, tokens_after)
 
     if not ctx_lines:
         result = f"(抱歉，找不到關於「{user_text}」的即時資訊)"
-        print(f"[RAG/Context] ⚠️ 未取得任何股價或新聞資料。")
+        log.warning("[RAG/Context] ⚠️ 未取得任何股價或新聞資料。")
     else:
+        used = []
+        if price:
+            used.append("股價")
+        if finmind_news:
+            used.append("FinMind 新聞")
+        if rss_news:
+            used.append("Google RSS")
+        if ft_map:
+            used.append("全文摘錄")
+        tier_line = f"{EVIDENCE_TIERS_PREFIX} 使用：{'、'.join(used) or '無'}"
+        if skipped:
+            tier_line += f"；因時間限制略過：{'、'.join(skipped)}"
+        ctx_lines.append("")
+        ctx_lines.append(tier_line)
         result = "\n".join(ctx_lines)
-        print(f"[RAG/Context] ✅ 組裝完成，共 {len(merged_news)} 則新聞。\n")
+        log.debug("[RAG/Context] ✅ 組裝完成，共 %d 則新聞。", len(merged_news))
 
-    # --- 寫入快取 ---
-    CACHE[user_text] = {'data': result, 'expires_at': now + CACHE_DURATION_SECONDS}
-    print(f"[RAG/Cache] 💾 已快取結果 → '{user_text}'（有效 {CACHE_DURATION_SECONDS} 秒）")
+    # --- 寫入快取（降級結果不快取，避免時間充裕的請求也拿到殘缺 context）---
+    if skipped:
+        log.info("[RAG/Cache] ⏭️ 本次為降級結果（略過：%s），不寫入快取。", "、".join(skipped))
+    else:
+        CACHE.set(user_text, result)
+        log.debug("[RAG/Cache] 💾 已快取結果 → '%s'（有效 %d 秒）", user_text, CACHE_DURATION_SECONDS)
 
-    print(f"[RAG/Done] 🏁 查詢流程結束：'{user_text}'\n")
+    if log.isEnabledFor(logging.DEBUG):
+        stats = pool_stats()
+        log.debug("[RAG/HTTP] 🔌 連線池：請求 %d 次，新建連線 %d 條，重用率 %.0f%%", stats["requests"], stats["new_connections"], stats["hit_ratio"] * 100)
+    log.info("[RAG/Done] 🏁 查詢流程結束：'%s'", user_text)
     #print(f"{result}\n")
     return result
 
@@ -177,9 +413,16 @@ def build_context(query: str):
 # 背景刷新後重新載入股票代號（由 cache.py 呼叫）
 # ---------------------------------------------------------
 def refresh_stock_map():
-    """由 cache.py 背景更新完成後呼叫，用於重新載入最新 STOCK_MAP"""
-    print("[RAG/Init] 🧭 載入 FinMind 股票代號清單中（背景刷新後）...")
+    """由 startup() 與 cache.py 背景更新完成後呼叫，用於重新載入最新 STOCK_MAP"""
+    print("[RAG/Init] 🧭 載入股票代號清單並重建名稱索引...")
     from retrievers.cache import load_stock_map_from_cache
-    global STOCK_MAP
-    STOCK_MAP = load_stock_map_from_cache()
-    print(f"[RAG/Init] ✅ 已重新載入 {len(STOCK_MAP)//2} 檔股票代號。")
+    global STOCK_MAP, STOCK_INDEX
+    stock_map = load_stock_map_from_cache()
+    if not stock_map:
+        print("[RAG/Init] ⚠️ 新的股票清單為空，保留舊的 STOCK_MAP。")
+        return
+    # 先建好新索引再一次替換，查詢端不會看到半成品
+    new_index = CompanyIndex(stock_map)
+    STOCK_INDEX = new_index
+    STOCK_MAP = stock_map
+    print(f"[RAG/Init] ✅ 已重新載入 {len(STOCK_MAP)//2} 檔股票代號（名稱索引已重建）。")
@@ -1,53 +1,239 @@
-# retrievers/cache.py（純 print(f"...") 版 + 自動 STOCK_MAP 同步 + Thread-safe）
+# retrievers/cache.py（含 LOG 版 + 自動 STOCK_MAP 同步 + Thread-safe）
+import json
+import os
 import time
 import threading
-import requests
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, List, Optional
-from config import FINMIND_API_KEY
+from config import (
+    FINMIND_API_KEY, STOCK_SNAPSHOT_PATH, HOT_TICKERS_TOP_N, HOT_REFRESH_INTERVAL, HOT_REFRESH_MAX_PER_ROUND,
+    PRICE_BULK_MODE, PRICE_TABLE_REFRESH,
+)
 from retrievers.stocks import fetch_price_finmind
 from retrievers.news import fetch_news_finmind
+from retrievers import finmind
+from retrievers.ttl_cache import TTLCache
+from retrievers.persist import get_shared_store, get_store, lazy_shared_store, lazy_store
+from retrievers.leader import WORKER_ID, election
+from retrievers.singleflight import SingleFlight
+from retrievers.price_table import MarketPriceTable, build_market_table
+from retrievers.logs import get_logger
+
+log = get_logger("cache")
 
 # === FinMind 全域快取（股票名/代號表） ===
 FINMIND_CACHE = {"data": None, "last_update": 0}
 FINMIND_CACHE_TTL = 604800  # 7 天
+FINMIND_RETRY_SECONDS = 60  # 背景刷新失敗時，多久後重試
 _AUTO_REFRESH_STARTED = False
+_READY = threading.Event()  # 有可用的股票清單（快照或 FinMind）就視為 ready
 STOCK_MAP: Dict[str, str] = {}
 
-PRICE_CACHE: Dict[str, Dict[str, Any]] = {}
-NEWS_CACHE: Dict[str, Dict[str, Any]] = {}
 PRICE_CACHE_TTL = 120       # 2 分鐘
 NEWS_CACHE_TTL = 86400      # 1 天
+# stale-while-revalidate：過期後在寬限時間內先回舊值，同時背景刷新
+PRICE_STALE_TTL = 600       # 10 分鐘
+NEWS_STALE_TTL = 86400      # 1 天
+PRICE_CACHE = TTLCache(
+    "price", ttl=PRICE_CACHE_TTL, max_entries=3000, stale_ttl=PRICE_STALE_TTL,
+    backend=lazy_shared_store(),  # SHARED_CACHE_URL 有設定時各 worker 共用
+)
+NEWS_CACHE = TTLCache(
+    "news", ttl=NEWS_CACHE_TTL, max_entries=2000, max_bytes=16 * 1024 * 1024,
+    backend=lazy_store(),  # CACHE_DB_PATH / SHARED_CACHE_URL 有設定時，新聞會寫入持久層，重啟後沿用、各 worker 共用
+    stale_ttl=NEWS_STALE_TTL,
+)
 
 LOCK = threading.Lock()  # 🔒 避免多執行緒競態
 
+# 熱門代號同時未命中時，只讓一個請求打 FinMind，其他人共用結果
+_PRICE_FLIGHT = SingleFlight("price")
+_NEWS_FLIGHT = SingleFlight("news")
+# 背景刷新 / 預熱用另一組 flight：背景優先度的呼叫可能為了讓出 FinMind 額度而久等，
+# 使用者請求不能搭它的便車（否則會跟著等、也不會被限流器視為排隊中的使用者）
+_PRICE_BG_FLIGHT = SingleFlight("price_background")
+_NEWS_BG_FLIGHT = SingleFlight("news_background")
+
+# 背景刷新（stale 命中後 / 熱門代號預熱）
+_REFRESH_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="cache-refresh")
+_REFRESHING = set()
+_REFRESHING_LOCK = threading.Lock()
+
+# 熱門代號統計：{ticker: 次數}（每輪預熱後減半，偏重近期熱度）
+_HOT_COUNTS: Counter = Counter()
+_HOT_NAMES: Dict[str, Optional[str]] = {}
+_HOT_LOCK = threading.Lock()
+_HOT_REFRESH_STARTED = False
+
+# 全市場股價表（PRICE_BULK_MODE）：整張表在刷新時一次替換
+_MARKET_TABLE: Optional[MarketPriceTable] = None
+_MARKET_TABLE_STARTED = False
+_MARKET_SYNCED_AT = 0.0  # 目前這張表在共用快取中的 built_at（follower 判斷要不要換表）
+MARKET_TABLE_MAX_AGE = PRICE_TABLE_REFRESH * 3  # 秒；刷新一直失敗、表太舊時改走逐檔查詢
+
+# 多 worker 部署：背景刷新只由 leader 執行，follower 從共用快取同步結果
+FOLLOWER_POLL_SECONDS = 300  # follower 多久檢查一次共用快取裡的股票清單 / 全市場股價表
+_HOT_NS = "hot_counts"       # 各 worker 發布自己的熱門代號統計，leader 合併後預熱
+_MARKET_NS = "market"
+_MARKET_KEY = "table"
+
+
+# ---------------------------------------------------------
+# 股票清單持久化（CACHE_DB_PATH 有設定時才啟用）
+# ---------------------------------------------------------
+_STOCK_INFO_NS = "finmind"
+_STOCK_INFO_KEY = "TaiwanStockInfo"
+
+
+def _load_stock_info_from_disk():
+    """從持久層載入未過期的股票清單（保留原本的 last_update，TTL 照舊計算）"""
+    store = get_store()
+    if store is None:
+        return
+    found = store.get(_STOCK_INFO_NS, _STOCK_INFO_KEY)
+    if not found:
+        return
+    payload, _ = found
+    FINMIND_CACHE["data"] = payload.get("data") or None
+    FINMIND_CACHE["last_update"] = payload.get("last_update", 0)
+    if FINMIND_CACHE["data"]:
+        print(f"[CACHE/FinMind] 💽 從磁碟載入 TaiwanStockInfo，共 {len(FINMIND_CACHE['data'])} 筆。")
+
+
+def _save_stock_info_to_disk(data, last_update: float):
+    store = get_store()
+    if store is None:
+        return
+    try:
+        store.set(_STOCK_INFO_NS, _STOCK_INFO_KEY, {"data": data, "last_update": last_update}, FINMIND_CACHE_TTL)
+    except Exception as e:
+        print(f"[CACHE/FinMind] ⚠️ 股票清單寫入磁碟失敗：{e}")
+
+
+def _load_stock_snapshot_file():
+    """讀取本機 JSON 快照（不論新舊都先拿來用，過期與否交給背景刷新判斷）"""
+    if not STOCK_SNAPSHOT_PATH or not os.path.exists(STOCK_SNAPSHOT_PATH):
+        return
+    try:
+        with open(STOCK_SNAPSHOT_PATH, "r", encoding="utf-8") as f:
+            payload = json.load(f)
+    except Exception as e:
+        print(f"[CACHE/FinMind] ⚠️ 讀取股票清單快照失敗：{e}")
+        return
+    FINMIND_CACHE["data"] = payload.get("data") or None
+    FINMIND_CACHE["last_update"] = payload.get("last_update", 0)
+    if FINMIND_CACHE["data"]:
+        print(f"[CACHE/FinMind] 📄 從快照檔載入 TaiwanStockInfo，共 {len(FINMIND_CACHE['data'])} 筆。")
+
+
+def _save_stock_snapshot_file(data, last_update: float):
+    """寫入 JSON 快照（先寫暫存檔再 rename，避免寫到一半被讀到）"""
+    if not STOCK_SNAPSHOT_PATH:
+        return
+    try:
+        d = os.path.dirname(os.path.abspath(STOCK_SNAPSHOT_PATH))
+        os.makedirs(d, exist_ok=True)
+        tmp = f"{STOCK_SNAPSHOT_PATH}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"data": data, "last_update": last_update}, f, ensure_ascii=False)
+        os.replace(tmp, STOCK_SNAPSHOT_PATH)
+    except Exception as e:
+        print(f"[CACHE/FinMind] ⚠️ 股票清單快照寫入失敗：{e}")
+
+
+# ---------------------------------------------------------
+# 啟動流程（不做網路 I/O）
+# ---------------------------------------------------------
+def load_stock_snapshot() -> bool:
+    """同步載入本機股票清單（持久層 → JSON 快照檔），有資料就標記 ready"""
+    with LOCK:
+        if not FINMIND_CACHE["data"]:
+            _load_stock_info_from_disk()
+        if not FINMIND_CACHE["data"]:
+            _load_stock_snapshot_file()
+        if FINMIND_CACHE["data"]:
+            _READY.set()
+        else:
+            print("[CACHE/FinMind] ⚠️ 沒有可用的本機快照，等待背景從 FinMind 抓取。")
+    return _READY.is_set()
+
+
+def is_ready() -> bool:
+    return _READY.is_set()
+
+
+def wait_until_ready(timeout: Optional[float] = None) -> bool:
+    """阻塞到股票清單可用為止（背景執行緒用）"""
+    return _READY.wait(timeout)
+
+
+def startup() -> bool:
+    """
+    啟動入口：先同步讀本機快照（毫秒級），再啟動背景執行緒向 FinMind 更新。
+    回傳目前是否已 ready（有快照就能立即服務）。
+    """
+    load_stock_snapshot()
+    start_finmind_auto_refresh()
+    start_hot_ticker_refresh()
+    if PRICE_BULK_MODE:
+        start_market_price_refresh()
+    return is_ready()
+
 
 # ---------------------------------------------------------
 # FinMind 全域資料（股票清單）快取
 # ---------------------------------------------------------
+def _rebuild_stock_map(data):
+    STOCK_MAP.clear()
+    for item in data:
+        name = (item.get("stock_name") or "").strip()
+        code = (item.get("stock_id") or "").strip()
+        if name and code:
+            STOCK_MAP[name.upper()] = code
+            STOCK_MAP[code] = code
+
+
+def _sync_stock_info_from_store() -> bool:
+    """follower 用：共用快取裡的股票清單比手上的新就換上（不打 FinMind）"""
+    store = get_store()
+    if store is None:
+        return False
+    found = store.get(_STOCK_INFO_NS, _STOCK_INFO_KEY)
+    if not found:
+        return False
+    payload, _ = found
+    data = payload.get("data")
+    if not data or payload.get("last_update", 0) <= FINMIND_CACHE["last_update"]:
+        return False
+    with LOCK:
+        FINMIND_CACHE["data"] = data
+        FINMIND_CACHE["last_update"] = payload["last_update"]
+        _rebuild_stock_map(data)
+    _READY.set()
+    log.info("[CACHE/FinMind] 🔄 已從共用快取同步 TaiwanStockInfo，共 %d 筆。", len(data))
+    return True
+
+
 def get_finmind_data():
     """每週自動更新一次 TaiwanStockInfo 並同步更新 STOCK_MAP"""
     now = time.time()
     with LOCK:
+        if not FINMIND_CACHE["data"]:
+            _load_stock_info_from_disk()
         if not FINMIND_CACHE["data"] or now - FINMIND_CACHE["last_update"] > FINMIND_CACHE_TTL:
             print("[CACHE/FinMind] ⏳ 快取過期，重新抓取 TaiwanStockInfo...")
             try:
-                url = "https://api.finmindtrade.com/api/v4/data"
-                params = {"dataset": "TaiwanStockInfo"}
-                headers = {"Authorization": f"Bearer {FINMIND_API_KEY}"}
-                res = requests.get(url, params=params, headers=headers, timeout=15)
-                res.raise_for_status()
-                data = res.json().get("data", [])
+                data = finmind.get_data("TaiwanStockInfo", token=FINMIND_API_KEY, timeout=15)
                 FINMIND_CACHE["data"] = data
                 FINMIND_CACHE["last_update"] = now
+                _save_stock_info_to_disk(data, now)
+                _save_stock_snapshot_file(data, now)
+                if data:
+                    _READY.set()
 
                 # ✅ 更新 STOCK_MAP
-                STOCK_MAP.clear()
-                for item in data:
-                    name = (item.get("stock_name") or "").strip()
-                    code = (item.get("stock_id") or "").strip()
-                    if name and code:
-                        STOCK_MAP[name.upper()] = code
-                        STOCK_MAP[code] = code
+                _rebuild_stock_map(data)
 
                 print(f"[CACHE/FinMind] ✅ 更新成功：FinMind 共 {len(data)} 筆 → 有效股票 {len(STOCK_MAP)//2} 檔。")
                 print(f"[CACHE/FinMind] ✅ STOCK_MAP 更新完成（來源：FinMind API），共 {len(STOCK_MAP)//2} 檔。")
@@ -71,21 +257,32 @@ def start_finmind_auto_refresh():
         return
     _AUTO_REFRESH_STARTED = True
 
+    leader = election("finmind-refresh")
+
     def loop():
-        while True:
-            print("\n[CACHE/FinMind] 🔁 背景刷新中...")
-            get_finmind_data()
-            load_stock_map_from_cache()
-            print("[CACHE/FinMind] 🌱 背景刷新完成（FinMind + STOCK_MAP 已同步）\n")
-            time.sleep(FINMIND_CACHE_TTL)
-            # 🔁 通知 RAG 模組重新載入股票代號
-            try:
-                from rag import refresh_stock_map
-                refresh_stock_map()
-            except Exception as e:
-                print(f"[CACHE/FinMind] ⚠️ 無法通知 RAG 更新：{e}")
+        with finmind.background():  # 背景請求：讓出額度給使用者查詢
+            while True:
+                before = FINMIND_CACHE["last_update"]
+                if leader.is_leader():
+                    print("\n[CACHE/FinMind] 🔁 背景刷新中...")
+                    get_finmind_data()
+                    # 下次刷新時間：快取到期時；若還是過期狀態（抓取失敗）就稍後重試
+                    wait = max(FINMIND_RETRY_SECONDS, FINMIND_CACHE["last_update"] + FINMIND_CACHE_TTL - time.time())
+                else:
+                    # follower：只從共用快取同步 leader 抓好的清單
+                    _sync_stock_info_from_store()
+                    wait = FOLLOWER_POLL_SECONDS
+                if FINMIND_CACHE["last_update"] != before:
+                    # 🔁 通知 RAG 模組重新載入股票代號
+                    try:
+                        from rag import refresh_stock_map
+                        refresh_stock_map()
+                    except Exception as e:
+                        print(f"[CACHE/FinMind] ⚠️ 無法通知 RAG 更新：{e}")
+                    print("[CACHE/FinMind] 🌱 背景刷新完成（FinMind + STOCK_MAP 已同步）\n")
+                time.sleep(wait)
 
-    threading.Thread(target=loop, daemon=True).start()
+    threading.Thread(target=loop, name="finmind-refresh", daemon=True).start()
     print("[CACHE/FinMind] 🚀 已啟動自動更新執行緒（每週刷新一次）")
 
 
@@ -109,21 +306,231 @@ def load_stock_map_from_cache() -> Dict[str, str]:
     return stock_map
 
 
+# ---------------------------------------------------------
+# 背景刷新（stale-while-revalidate）
+# ---------------------------------------------------------
+def _refresh_in_background(cache: TTLCache, flight: SingleFlight, key: str, fn, *args):
+    """排一個背景刷新；同一個 key 已在排隊/刷新中就略過"""
+    tag = (cache.name, key)
+    with _REFRESHING_LOCK:
+        if tag in _REFRESHING:
+            return
+        _REFRESHING.add(tag)
+
+    def task():
+        try:
+            if key not in cache:  # 可能已被其他請求刷新
+                with finmind.background():
+                    flight.do(key, fn, *args)
+        except Exception as e:
+            log.warning("[CACHE/Refresh] ⚠️ 背景刷新 %s:%s 失敗：%s", cache.name, key, e)
+        finally:
+            with _REFRESHING_LOCK:
+                _REFRESHING.discard(tag)
+
+    _REFRESH_POOL.submit(task)
+
+
+# ---------------------------------------------------------
+# 熱門代號預熱
+# ---------------------------------------------------------
+def record_query(ticker: str, company_name: Optional[str] = None):
+    """記錄一次代號查詢，供熱門代號預熱使用"""
+    with _HOT_LOCK:
+        _HOT_COUNTS[ticker] += 1
+        if company_name:
+            _HOT_NAMES[ticker] = company_name
+
+
+def _hot_ranking(n: int):
+    """
+    熱門前 n 檔 [(ticker, 公司名), ...]。
+    共用快取模式下合併所有 worker 發布的統計（每個 worker 只看得到打到自己的查詢）。
+    """
+    with _HOT_LOCK:
+        counts = Counter(_HOT_COUNTS)
+        names = dict(_HOT_NAMES)
+    store = get_shared_store()
+    if store is not None:
+        try:
+            for worker, published in store.items(_HOT_NS):
+                if worker == WORKER_ID:
+                    continue
+                for ticker, (count, name) in published.items():
+                    counts[ticker] += count
+                    if name:
+                        names.setdefault(ticker, name)
+        except Exception as e:
+            log.warning("[CACHE/Hot] ⚠️ 讀取其他 worker 的熱門統計失敗：%s", e)
+    return [(t, names.get(t)) for t, _ in counts.most_common(n)]
+
+
+def hot_tickers(n: int = HOT_TICKERS_TOP_N) -> List[str]:
+    return [t for t, _ in _hot_ranking(n)]
+
+
+def _publish_hot_counts():
+    """把本 worker 的統計寫進共用快取，給 leader 合併（存活 3 輪，worker 消失後自然過期）"""
+    store = get_shared_store()
+    if store is None:
+        return
+    with _HOT_LOCK:
+        published = {t: [c, _HOT_NAMES.get(t)] for t, c in _HOT_COUNTS.items()}
+    try:
+        store.set(_HOT_NS, WORKER_ID, published, HOT_REFRESH_INTERVAL * 3)
+    except Exception as e:
+        log.warning("[CACHE/Hot] ⚠️ 發布熱門統計失敗：%s", e)
+
+
+def _decay_hot_counts():
+    """熱度衰減：每輪減半，太冷的直接移除"""
+    with _HOT_LOCK:
+        for t in list(_HOT_COUNTS):
+            _HOT_COUNTS[t] //= 2
+            if _HOT_COUNTS[t] <= 0:
+                del _HOT_COUNTS[t]
+                _HOT_NAMES.pop(t, None)
+
+
+def _warm_hot_tickers():
+    top = _hot_ranking(HOT_TICKERS_TOP_N)
+
+    # 只刷新下一輪之前就會過期的項目；bulk 模式下股價由全市場股價表提供，不逐檔預熱
+    horizon = HOT_REFRESH_INTERVAL
+    warm_price = not _market_table_usable()
+    refreshed = 0
+    for ticker, name in top:
+        if refreshed >= HOT_REFRESH_MAX_PER_ROUND:
+            break
+        if warm_price and PRICE_CACHE.ttl_remaining(ticker) < horizon:
+            _PRICE_BG_FLIGHT.do(ticker, _refresh_price, ticker)
+            refreshed += 1
+        if refreshed < HOT_REFRESH_MAX_PER_ROUND and NEWS_CACHE.ttl_remaining(ticker) < horizon:
+            _NEWS_BG_FLIGHT.do(ticker, _refresh_news, ticker, name)
+            refreshed += 1
+    if refreshed:
+        print(f"[CACHE/Hot] 🔥 已預熱 {len(top)} 檔熱門代號（刷新 {refreshed} 項）。")
+
+
+def start_hot_ticker_refresh():
+    """背景執行緒：每 HOT_REFRESH_INTERVAL 秒刷新前 N 檔熱門代號的股價與新聞"""
+    global _HOT_REFRESH_STARTED
+    if _HOT_REFRESH_STARTED or HOT_TICKERS_TOP_N <= 0:
+        return
+    _HOT_REFRESH_STARTED = True
+
+    leader = election("hot-ticker-refresh")
+
+    def loop():
+        with finmind.background():  # 背景請求：讓出額度給使用者查詢
+            while True:
+                time.sleep(HOT_REFRESH_INTERVAL)
+                try:
+                    _publish_hot_counts()
+                    if leader.is_leader():
+                        _warm_hot_tickers()
+                except Exception as e:
+                    print(f"[CACHE/Hot] ⚠️ 熱門代號預熱失敗：{e}")
+                finally:
+                    _decay_hot_counts()
+
+    threading.Thread(target=loop, name="hot-ticker-refresh", daemon=True).start()
+    print(f"[CACHE/Hot] 🚀 已啟動熱門代號預熱（前 {HOT_TICKERS_TOP_N} 檔，每 {HOT_REFRESH_INTERVAL} 秒）")
+
+
+# ---------------------------------------------------------
+# 全市場股價表（bulk 模式）
+# ---------------------------------------------------------
+def refresh_market_table():
+    global _MARKET_TABLE, _MARKET_SYNCED_AT
+    table = build_market_table(FINMIND_API_KEY, previous=_MARKET_TABLE)
+    if table is not None:
+        _MARKET_TABLE = table
+        store = get_shared_store()
+        if store is not None:
+            _MARKET_SYNCED_AT = table.built_at
+            payload = table.to_payload()
+            store.set(_MARKET_NS, _MARKET_KEY, payload, PRICE_TABLE_REFRESH * 3)
+
+
+def _sync_market_table_from_store():
+    """follower 用：共用快取裡有 leader 新建的全市場股價表就換上"""
+    global _MARKET_TABLE, _MARKET_SYNCED_AT
+    store = get_shared_store()
+    found = store.get(_MARKET_NS, _MARKET_KEY) if store is not None else None
+    if not found:
+        return
+    payload, _ = found
+    if payload.get("built_at", 0) <= _MARKET_SYNCED_AT:
+        return
+    _MARKET_TABLE = MarketPriceTable.from_payload(payload)
+    _MARKET_SYNCED_AT = payload["built_at"]
+    log.info("[CACHE/Bulk] 🔄 已從共用快取同步全市場股價表（%s，%d 檔）", _MARKET_TABLE.date, len(_MARKET_TABLE))
+
+
+def start_market_price_refresh():
+    """背景執行緒：每 PRICE_TABLE_REFRESH 秒更新一次全市場股價表"""
+    global _MARKET_TABLE_STARTED
+    if _MARKET_TABLE_STARTED:
+        return
+    _MARKET_TABLE_STARTED = True
+
+    leader = election("market-price-refresh")
+
+    def loop():
+        with finmind.background():  # 背景請求：讓出額度給使用者查詢
+            while True:
+                try:
+                    if leader.is_leader():
+                        refresh_market_table()
+                    else:
+                        _sync_market_table_from_store()
+                except Exception as e:
+                    print(f"[CACHE/Bulk] ⚠️ 全市場股價表更新失敗：{e}")
+                time.sleep(PRICE_TABLE_REFRESH)
+
+    threading.Thread(target=loop, name="market-price-refresh", daemon=True).start()
+    print(f"[CACHE/Bulk] 🚀 已啟動全市場股價表更新（每 {PRICE_TABLE_REFRESH} 秒）")
+
+
 # ---------------------------------------------------------
 # 股價快取層
 # ---------------------------------------------------------
+def _market_table_usable() -> bool:
+    table = _MARKET_TABLE
+    return PRICE_BULK_MODE and table is not None and table.age() <= MARKET_TABLE_MAX_AGE
+
+
 def get_price_with_cache(ticker: str) -> Optional[Dict[str, Any]]:
-    now = time.time()
-    if ticker in PRICE_CACHE and now - PRICE_CACHE[ticker]["time"] < PRICE_CACHE_TTL:
-        print(f"[CACHE/Price] ✅ 使用快取股價 → {ticker}")
-        return PRICE_CACHE[ticker]["data"]
+    # bulk 模式：先查全市場股價表（O(1)，不打 API）；查無代號或表已過舊再走逐檔查詢
+    table = _MARKET_TABLE
+    if table is not None and table.age() > MARKET_TABLE_MAX_AGE:
+        log.info("[CACHE/Price] ⚠️ 全市場股價表已 %d 秒未更新（%s），改走逐檔查詢 → %s",
+                 int(table.age()), table.date, ticker)
+    elif table is not None:
+        price = table.lookup(ticker)
+        if price:
+            log.debug("[CACHE/Price] ✅ 全市場股價表命中 → %s（%s）", ticker, table.date)
+            return price
 
+    cached, fresh = PRICE_CACHE.get_stale(ticker)
+    if cached is not None:
+        if fresh:
+            log.debug("[CACHE/Price] ✅ 使用快取股價 → %s", ticker)
+        else:
+            log.info("[CACHE/Price] ♻️ 先回傳過期股價並背景刷新 → %s", ticker)
+            _refresh_in_background(PRICE_CACHE, _PRICE_BG_FLIGHT, ticker, _refresh_price, ticker)
+        return cached
+    return _PRICE_FLIGHT.do(ticker, _refresh_price, ticker)
+
+
+def _refresh_price(ticker: str) -> Optional[Dict[str, Any]]:
     price = fetch_price_finmind(ticker, FINMIND_API_KEY)
     if price:
-        PRICE_CACHE[ticker] = {"data": price, "time": now}
-        print(f"[CACHE/Price] ✅ 股價更新完成 → {ticker}：{price['price']} ({price['pct']}%)")
+        PRICE_CACHE.set(ticker, price)
+        log.debug("[CACHE/Price] ✅ 股價更新完成 → %s：%s (%s%%)", ticker, price["price"], price["pct"])
     else:
-        print(f"[CACHE/Price] ⚠️ 抓取 {ticker} 失敗或無資料。")
+        log.warning("[CACHE/Price] ⚠️ 抓取 %s 失敗或無資料。", ticker)
     return price
 
 
@@ -131,24 +538,30 @@ def get_price_with_cache(ticker: str) -> Optional[Dict[str, Any]]:
 # 新聞快取層
 # ---------------------------------------------------------
 def get_news_with_cache(ticker: str, company_name: Optional[str]) -> List[Dict[str, Any]]:
-    now = time.time()
-    if ticker in NEWS_CACHE and now - NEWS_CACHE[ticker]["time"] < NEWS_CACHE_TTL:
-        print(f"[CACHE/News] ✅ 使用FinMind快取新聞 → {ticker}")
-        return NEWS_CACHE[ticker]["data"]
+    cached, fresh = NEWS_CACHE.get_stale(ticker)
+    if cached is not None:
+        if fresh:
+            log.debug("[CACHE/News] ✅ 使用FinMind快取新聞 → %s", ticker)
+        else:
+            log.info("[CACHE/News] ♻️ 先回傳過期新聞並背景刷新 → %s", ticker)
+            _refresh_in_background(NEWS_CACHE, _NEWS_BG_FLIGHT, ticker, _refresh_news, ticker, company_name)
+        return cached
+    return _NEWS_FLIGHT.do(ticker, _refresh_news, ticker, company_name)
+
 
-    print(f"[CACHE/News] ⏳ 從 FinMind 抓取新聞 → {ticker}")
-    news = fetch_news_finmind(ticker, FINMIND_API_KEY, company_name=company_name)
+def _refresh_news(ticker: str, company_name: Optional[str]) -> List[Dict[str, Any]]:
+    log.debug("[CACHE/News] ⏳ 從 FinMind 抓取新聞 → %s", ticker)
+    try:
+        news = fetch_news_finmind(ticker, FINMIND_API_KEY, company_name=company_name)
+    except finmind.FinMindThrottled:
+        # 被限流不代表沒新聞：不寫入快取（否則空結果會被快取 NEWS_CACHE_TTL），舊資料照常服務
+        stale, _ = NEWS_CACHE.get_stale(ticker)
+        log.info("[CACHE/News] 🚦 FinMind 額度受限，%s → %s", "沿用過期新聞" if stale is not None else "本次不含 FinMind 新聞", ticker)
+        return stale if stale is not None else []
     if news:
-        NEWS_CACHE[ticker] = {"data": news, "time": now}
-        print(f"[CACHE/News] ✅ FinMind快取新聞更新完成 → {ticker}，共 {len(news)} 則。\n")
+        NEWS_CACHE.set(ticker, news)
+        log.debug("[CACHE/News] ✅ FinMind快取新聞更新完成 → %s，共 %d 則。", ticker, len(news))
     else:
-        NEWS_CACHE[ticker] = {"data": news, "time": now}
-        print(f"[CACHE/News] ⚠️ 抓取 {ticker} 無新聞。")
+        NEWS_CACHE.set(ticker, news or [])
+        log.info("[CACHE/News] ⚠️ 抓取 %s 無新聞。", ticker)
     return news or []
-
-
-# ---------------------------------------------------------
-# 啟動時執行初始化
-# ---------------------------------------------------------
-get_finmind_data()
-start_finmind_auto_refresh()
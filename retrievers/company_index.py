@@ -0,0 +1,210 @@
+# retrievers/company_index.py（公司名稱 / 代號索引：Aho-Corasick 自動機 + 字元 n-gram 模糊比對）
+from __future__ import annotations
+
+from collections import Counter, deque
+from typing import Dict, List, Tuple
+
+
+class AhoCorasick:
+    """
+    多模式字串比對自動機：一次掃過查詢字串，就能找出所有出現的關鍵字。
+    建好之後只讀不寫，可在多執行緒間共用。
+    """
+
+    def __init__(self, patterns):
+        # goto[state] = {char: next_state}；fail / out 以 state 編號索引
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[str]] = [[]]
+        for p in patterns:
+            if p:
+                self._add(p)
+        self._build_fail_links()
+
+    def _add(self, pattern: str):
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+                self._goto[state][ch] = nxt
+            state = nxt
+        self._out[state].append(pattern)
+
+    def _build_fail_links(self):
+        q = deque(self._goto[0].values())
+        while q:
+            state = q.popleft()
+            for ch, nxt in self._goto[state].items():
+                q.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                cand = self._goto[f].get(ch, 0)
+                self._fail[nxt] = cand if cand != nxt else 0
+                # 合併 fail 鏈上的輸出，查詢時不必再沿鏈回溯
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find_all(self, text: str) -> List[Tuple[int, str]]:
+        """回傳 [(起始位置, 關鍵字), ...]，依結束位置排序"""
+        hits: List[Tuple[int, str]] = []
+        state = 0
+        goto, fail, out = self._goto, self._fail, self._out
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for p in out[state]:
+                hits.append((i - len(p) + 1, p))
+        return hits
+
+
+def _ngram_keys(s: str) -> List[str]:
+    """
+    模糊比對用的索引鍵：相鄰字 bigram + 隔一字的 skip-bigram。
+    skip-bigram 讓「中間那個字打錯」也找得到（「台機電」與「台積電」共用「台_電」）。
+    """
+    keys = [s[i:i + 2] for i in range(len(s) - 1)]
+    keys += [s[i] + "_" + s[i + 2] for i in range(len(s) - 2)]
+    return keys
+
+
+def _substring_distance(pattern: str, text: str) -> int:
+    """pattern 與 text 中「任一子字串」的最小編輯距離（Sellers 演算法，O(len(pattern)·len(text))）"""
+    prev = [0] * (len(text) + 1)
+    for i, pc in enumerate(pattern, 1):
+        cur = [i] + [0] * len(text)
+        for j, tc in enumerate(text, 1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (pc != tc))
+        prev = cur
+    return min(prev)
+
+
+# 查詢開頭是公司名稱時，名稱後面常接的字詞（「台積店會漲嗎」「台積店股價」）
+_QUERY_FOLLOWERS = (
+    "會", "的", "嗎", "呢", "是", "還", "要", "能", "可以", "值得", "怎", "如何", "為什麼", "今", "明",
+    "最近", "現在", "目前", "股", "新聞", "消息", "漲", "跌", "走勢", "營收", "財報", "表現", "跟", "和", "與",
+)
+
+
+def _is_cjk(ch: str) -> bool:
+    return "\u4e00" <= ch <= "\u9fff"
+
+
+def _middle_typo(name: str, text: str) -> bool:
+    """
+    短名稱專用：text 中是否有等長片段與 name 頭尾相同、只有中間一個字不同（「台機電」→「台積電」）。
+    刪字 / 尾字不同都不算，否則「中華隊」「國泰人壽」「台灣經濟」都會被當成公司名稱。
+    """
+    n = len(name)
+    for i in range(len(text) - n + 1):
+        w = text[i:i + n]
+        if w[0] == name[0] and w[-1] == name[-1] and sum(a != b for a, b in zip(w, name)) == 1:
+            return True
+    return False
+
+
+def _anchored_typo(name: str, text: str) -> bool:
+    """
+    短名稱專用：查詢開頭的等長片段與 name 只差一個字（任何位置，「台積店」→「台積電」），
+    且片段後面是查詢結尾、非中文字，或常見的接續字詞（「台積店會漲嗎」）。
+    「台灣經濟如何」「國泰人壽」後面接的是同一個詞的下一個字，不算。
+    """
+    n = len(name)
+    window = text[:n]
+    if len(window) < n or sum(a != b for a, b in zip(window, name)) != 1:
+        return False
+    rest = text[n:].lstrip()
+    return not rest or not _is_cjk(rest[0]) or rest.startswith(_QUERY_FOLLOWERS)
+
+
+class CompanyIndex:
+    """
+    STOCK_MAP（名稱/代號 → 代號）+ Aho-Corasick 自動機 + 名稱的字元 n-gram 倒排索引。
+    三者一起建立、一起替換，讀取端只要拿到同一個物件就不會看到半新半舊的狀態。
+    """
+
+    MIN_NAME_LEN = 2  # 單字名稱太容易誤判，不納入片段比對
+
+    # --- 模糊比對（錯字容錯）---
+    FUZZY_MIN_NAME_LEN = 3       # 兩字名稱錯一字就只剩一字，不做模糊比對
+    FUZZY_SHORT_NAME_LEN = 3     # ≤ 此長度的名稱只接受 _middle_typo / _anchored_typo 兩種錯一字
+    FUZZY_MIN_SIMILARITY = 0.7   # 1 - 編輯距離/名稱長度；4 字錯 1 字 = 0.75，錯 2 字不算
+    FUZZY_MAX_QUERY_LEN = 32     # 只看查詢前 N 字，限制掃描量
+    FUZZY_MAX_POSTING = 200      # 太常見的 n-gram（如「科技」）不拿來找候選
+    FUZZY_MAX_CANDIDATES = 30    # 最多驗證幾個候選（編輯距離較貴）
+
+    def __init__(self, stock_map: Dict[str, str]):
+        self.stock_map = stock_map
+        self._automaton = AhoCorasick(k for k in stock_map if len(k) >= self.MIN_NAME_LEN)
+
+        # 倒排索引：n-gram → 名稱編號（代號是純數字，打錯也不該亂猜，不納入）
+        self._names: List[str] = [
+            k for k in stock_map if len(k) >= self.FUZZY_MIN_NAME_LEN and not k.isdigit()
+        ]
+        self._name_keys: List[int] = []
+        self._postings: Dict[str, List[int]] = {}
+        for i, name in enumerate(self._names):
+            keys = set(_ngram_keys(name))
+            self._name_keys.append(len(keys))
+            for key in keys:
+                self._postings.setdefault(key, []).append(i)
+
+    def __len__(self) -> int:
+        return len(self.stock_map)
+
+    def find_all(self, query: str) -> List[Tuple[str, str]]:
+        """
+        回傳查詢中出現的所有公司 [(比對到的名稱/代號, 股票代號), ...]，
+        依「較長者優先、同長度取較前面」排序。
+        被較長名稱完整包住的片段（例如「台積電」裡的「台積」）不另外列出。
+        """
+        hits = self._automaton.find_all(query)
+        hits.sort(key=lambda h: (-len(h[1]), h[0]))
+        out: List[Tuple[str, str]] = []
+        spans: List[Tuple[int, int]] = []
+        seen = set()
+        for start, name in hits:
+            end = start + len(name)
+            if name in seen or any(s <= start and end <= e for s, e in spans):
+                continue
+            seen.add(name)
+            spans.append((start, end))
+            out.append((name, self.stock_map[name]))
+        return out
+
+    def fuzzy_find(self, query: str, limit: int = 3) -> List[Tuple[str, str, float]]:
+        """
+        錯字容錯：回傳最像的公司 [(名稱, 股票代號, 相似度), ...]，相似度高者在前。
+        1) 以查詢的 n-gram 查倒排索引，依「名稱 n-gram 被覆蓋的比例」取前幾名候選
+        2) 候選再算與查詢子字串的編輯距離，相似度 ≥ FUZZY_MIN_SIMILARITY 才回傳；
+           三字以下的名稱改用 _middle_typo（中間一字打錯）或 _anchored_typo（查詢開頭的名稱錯一字）
+        查詢長度、posting 長度、候選數都有上限，最壞情況也只是固定量的計算。
+        """
+        q = query[: self.FUZZY_MAX_QUERY_LEN]
+        hits: Counter = Counter()
+        for key in set(_ngram_keys(q)):
+            ids = self._postings.get(key)
+            if ids and len(ids) <= self.FUZZY_MAX_POSTING:
+                hits.update(ids)
+        if not hits:
+            return []
+
+        ranked = sorted(hits.items(), key=lambda kv: -kv[1] / self._name_keys[kv[0]])
+        out: List[Tuple[str, str, float]] = []
+        for i, _ in ranked[: self.FUZZY_MAX_CANDIDATES]:
+            name = self._names[i]
+            if len(name) <= self.FUZZY_SHORT_NAME_LEN:
+                ok = _middle_typo(name, q) or _anchored_typo(name, q)
+                sim = 1.0 - 1 / len(name)
+            else:
+                sim = 1.0 - _substring_distance(name, q) / len(name)
+                ok = sim >= self.FUZZY_MIN_SIMILARITY
+            if ok:
+                out.append((name, self.stock_map[name], round(sim, 3)))
+        # 同分時較長的名稱優先（資訊量較多）
+        out.sort(key=lambda m: (-m[2], -len(m[0])))
+        return out[:limit]
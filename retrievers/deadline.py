@@ -0,0 +1,31 @@
+# retrievers/deadline.py（單次請求的時間預算：從 webhook 收到事件起算）
+import time
+from typing import Optional
+
+
+class Deadline:
+    """
+    請求層級的截止時間。由 app.py 依 LINE 事件時間建立，一路傳到 build_context / summarize_with_gpt，
+    各階段用 remaining() 判斷還剩多少時間、要不要降級。
+    """
+
+    def __init__(self, budget_s: float, start: Optional[float] = None):
+        self.start = time.time() if start is None else start
+        self.budget_s = budget_s
+        self.expires_at = self.start + budget_s
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.time())
+
+    def elapsed(self) -> float:
+        return time.time() - self.start
+
+    def expired(self) -> bool:
+        return time.time() >= self.expires_at
+
+    def cap(self, seconds: float, reserve: float = 0.0, floor: float = 0.5) -> float:
+        """把某階段的 timeout 壓在「剩餘時間 - 保留給後面階段的時間」以內"""
+        return max(floor, min(seconds, self.remaining() - reserve))
+
+    def __repr__(self) -> str:
+        return f"Deadline(budget={self.budget_s}s, remaining={self.remaining():.1f}s)"
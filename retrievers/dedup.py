@@ -0,0 +1,91 @@
+# retrievers/dedup.py（新聞近似重複偵測：MinHash 估計標題 / 摘要的 Jaccard 相似度）
+import re
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from retrievers.ranking import tokenize
+
+NUM_PERM = 64
+_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(20240601)  # 固定種子：同一組新聞每次分群結果一致
+_PERM_A = _rng.integers(1, _PRIME, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.integers(0, _PRIME, size=NUM_PERM, dtype=np.uint64)
+
+# 標題常見雜訊：Google News 的「 - 來源」尾巴、【】〔〕等標籤、標點與空白
+_SUFFIX_RE = re.compile(r"\s+[-–—|｜]\s+[^-–—|｜]{1,30}$")
+_BRACKET_RE = re.compile(r"[【〔\[（(][^】〕\]）)]{0,12}[】〕\]）)]")
+_NUM_RE = re.compile(r"\d+(?:\.\d+)?")
+
+
+def normalize_title(title: str, source: str = "") -> str:
+    t = (title or "").strip()
+    if source and t.endswith(source):
+        t = t[: -len(source)].rstrip(" -–—|｜")
+    t = _SUFFIX_RE.sub("", t)
+    t = _BRACKET_RE.sub(" ", t)
+    return t.strip()
+
+
+def minhash(text: str) -> Optional[np.ndarray]:
+    """以 tokenize()（中文 bigram / 英數整詞）為 shingle 的 MinHash 簽章；沒有 token 回傳 None"""
+    toks = set(tokenize(text))
+    if not toks:
+        return None
+    x = np.fromiter((zlib.crc32(t.encode("utf-8")) % _PRIME for t in toks), dtype=np.uint64, count=len(toks))
+    # (NUM_PERM, n_tokens)：a*x+b < 2^63，不會溢位
+    hashed = (_PERM_A[:, None] * x[None, :] + _PERM_B[:, None]) % _PRIME
+    return hashed.min(axis=1)
+
+
+def similarity(sig_a: Optional[np.ndarray], sig_b: Optional[np.ndarray]) -> float:
+    """兩個簽章相同位置相等的比例 ≈ Jaccard 相似度"""
+    if sig_a is None or sig_b is None:
+        return 0.0
+    return float(np.count_nonzero(sig_a == sig_b)) / NUM_PERM
+
+
+def _signatures(item: Dict) -> Tuple[str, Optional[np.ndarray], Optional[np.ndarray], frozenset]:
+    raw = (item.get("title") or "").strip()
+    title = normalize_title(raw, item.get("source") or "")
+    snippet = (item.get("summary") or item.get("description") or "").strip()
+    nums = frozenset(_NUM_RE.findall(title))
+    # 完全相同比對用的鍵：正規化後變空字串（如只有「【快訊】」）就退回原標題
+    key = title or raw
+    return key, minhash(title), (minhash(snippet) if snippet else None), nums
+
+
+def cluster_near_duplicates(items: List[Dict], threshold: float, limit: Optional[int] = None):
+    """
+    依序貪婪分群：每則新聞跟已保留的代表比對，標題（或兩邊都有的摘要）相似度 ≥ threshold 就併入該群。
+    正規化後標題完全相同一律視為重複（相似度 1.0），不依賴 MinHash（沒有 token 的標題簽章為 None）。
+    標題裡的數字不完全相同（任一邊有另一邊沒有的數字，如「9月營收 年增36%」vs「10月營收 年增36%」）視為不同新聞，不併群。
+    每群保留第一則（呼叫端的排序即優先序）。回傳 (kept, dropped)，dropped 為 [(item, 代表, 相似度)]。
+    limit：保留數達上限就停止（剩下的不再比對）。
+    """
+    kept: List[Dict] = []
+    kept_sigs: List[Tuple] = []
+    dropped: List[Tuple[Dict, Dict, float]] = []
+    for item in items:
+        if limit is not None and len(kept) >= limit:
+            break
+        key, t_sig, s_sig, nums = _signatures(item)
+        best, best_sim = None, 0.0
+        for rep, (rkey, rt, rs, rnums) in zip(kept, kept_sigs):
+            if key and key == rkey:
+                best, best_sim = rep, 1.0
+                break
+            if nums ^ rnums:
+                continue
+            sim = similarity(t_sig, rt)
+            if s_sig is not None and rs is not None:
+                sim = max(sim, similarity(s_sig, rs))
+            if sim > best_sim:
+                best, best_sim = rep, sim
+        if best is not None and best_sim >= threshold:
+            dropped.append((item, best, best_sim))
+            continue
+        kept.append(item)
+        kept_sigs.append((key, t_sig, s_sig, nums))
+    return kept, dropped
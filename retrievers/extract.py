@@ -0,0 +1,124 @@
+# retrievers/extract.py（網頁主文萃取：可抽換解析後端，selectolax / lxml 優先，bs4 保底）
+from typing import Callable, Dict, List, Optional
+
+# 三個後端共用同一套規則（與原本 bs4 版本一致）：
+#   1) 移除干擾標籤（含內文）
+#   2) 主文容器優先序：<article> → <main> → #content → <body>
+#   3) 以換行串接所有文字節點，空白正規化交給呼叫端
+NOISE_TAGS = ["script", "style", "noscript", "header", "footer", "nav", "aside"]
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as _SelectolaxParser
+except Exception:  # selectolax 未安裝或版本太舊（無 lexbor）
+    try:
+        from selectolax.parser import HTMLParser as _SelectolaxParser
+    except Exception:
+        _SelectolaxParser = None
+
+try:
+    import lxml.html as _lxml_html
+    from lxml import etree as _lxml_etree
+except Exception:
+    _lxml_html = None
+    _lxml_etree = None
+
+from bs4 import BeautifulSoup
+
+# bs4 只作保底；底層 parser 有 lxml 就用 lxml（對不合法 HTML 的容錯較好）
+_BS4_FEATURES = "lxml" if _lxml_html is not None else "html.parser"
+
+
+# -----------------------------
+# 各後端實作：輸入 HTML 字串，回傳主文原始文字（未正規化）；找不到主文回傳 ""
+# -----------------------------
+def _extract_selectolax(html: str) -> str:
+    tree = _SelectolaxParser(html)
+    tree.strip_tags(NOISE_TAGS)
+    main = (
+        tree.css_first("article")
+        or tree.css_first("main")
+        or tree.css_first("#content")
+        or tree.body
+    )
+    if main is None:
+        return ""
+    return main.text(separator="\n") or ""
+
+
+_LXML_MAIN_XPATHS = ("//article", "//main", "//*[@id='content']", "//body")
+_LXML_NOISE_XPATH = "|".join(f"//{t}" for t in NOISE_TAGS)
+_LXML_UTF8_PARSER = _lxml_html.HTMLParser(encoding="utf-8") if _lxml_html is not None else None
+
+
+def _extract_lxml(html: str) -> str:
+    try:
+        try:
+            root = _lxml_html.document_fromstring(html)
+        except ValueError:
+            # str 開頭帶 <?xml ... encoding=...?> 宣告時 lxml 拒收 str，改餵 UTF-8 bytes（忽略宣告的編碼）
+            root = _lxml_html.document_fromstring(html.encode("utf-8"), parser=_LXML_UTF8_PARSER)
+    except _lxml_etree.ParserError:
+        return ""  # 空文件
+    for el in root.xpath(_LXML_NOISE_XPATH):
+        el.drop_tree()  # 會保留 tail 文字，與 bs4 decompose 行為相同
+    # 註解 / processing instruction 的文字不是內文（bs4 get_text 也不含）
+    _lxml_etree.strip_elements(root, _lxml_etree.Comment, _lxml_etree.ProcessingInstruction, with_tail=False)
+    for xp in _LXML_MAIN_XPATHS:
+        found = root.xpath(xp)
+        if found:
+            return "\n".join(found[0].itertext())
+    return ""
+
+
+def _extract_bs4(html: str) -> str:
+    soup = BeautifulSoup(html, _BS4_FEATURES)
+    for tag in soup(NOISE_TAGS):
+        tag.decompose()
+    main = soup.find("article")
+    if main is None:
+        main = soup.find("main") or soup.find(attrs={"id": "content"}) or soup.body
+    if main is None:
+        return ""
+    return main.get_text(separator="\n")
+
+
+# 依速度排序；auto 會選第一個可用的
+_BACKENDS: Dict[str, Optional[Callable[[str], str]]] = {
+    "selectolax": _extract_selectolax if _SelectolaxParser is not None else None,
+    "lxml": _extract_lxml if _lxml_html is not None else None,
+    "bs4": _extract_bs4,
+}
+
+
+def available_backends() -> List[str]:
+    return [name for name, fn in _BACKENDS.items() if fn is not None]
+
+
+def resolve_backend(name: Optional[str] = None) -> str:
+    """指定的後端未安裝時退回 auto（不讓設定錯誤把全文功能弄壞）"""
+    name = (name or "auto").strip().lower()
+    if _BACKENDS.get(name) is not None:
+        return name
+    if name != "auto":
+        print(f"[EXTRACT] ⚠️ HTML 解析後端 {name} 不可用，改用自動選擇。")
+    return available_backends()[0]
+
+
+def extract_main_text(html: str, backend: Optional[str] = None) -> str:
+    """
+    萃取主文文字（未做空白正規化）。backend 不指定時自動選最快的已安裝後端。
+    快速後端解析失敗時退回 bs4，保持原本的容錯能力。
+    """
+    if not html:
+        return ""
+    name = backend if _BACKENDS.get(backend or "") is not None else resolve_backend(backend)
+    try:
+        return _BACKENDS[name](html)
+    except Exception as e:
+        if name == "bs4":
+            return ""
+        print(f"[EXTRACT] ⚠️ {name} 解析失敗，改用 bs4：{e}")
+        try:
+            return _extract_bs4(html)
+        except Exception:
+            return ""
@@ -0,0 +1,203 @@
+# retrievers/finmind.py（FinMind API 統一出口：token bucket 限流 + 使用者優先 + 402/429 退避 + 剩餘額度）
+import math
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from config import FINMIND_API_KEY, FINMIND_BURST, FINMIND_REQUESTS_PER_HOUR
+from retrievers import http_client, metrics
+from retrievers.logs import get_logger
+
+log = get_logger("finmind")
+
+API_URL = "https://api.finmindtrade.com/api/v4/data"
+
+USER = "user"              # 使用者查詢路徑（等不到額度就降級，不拖慢回覆）
+BACKGROUND = "background"  # 背景刷新 / 預熱 / 收錄（可以慢慢等，但不能搶使用者的額度）
+
+USER_MAX_WAIT = 3.0           # 秒；使用者請求最多等這麼久拿 token，之後直接降級
+BACKGROUND_MAX_WAIT = 120.0   # 秒
+BACKGROUND_RESERVE = 0.3      # bucket 低於此比例時背景請求先讓路，保留給使用者
+MAX_RETRIES = {USER: 1, BACKGROUND: 3}
+BACKOFF_BASE = {402: 30.0, 429: 2.0}   # 秒；402 = 超過方案額度，429 = 短時間太頻繁
+BACKOFF_CAP = {402: 600.0, 429: 60.0}
+THROTTLE_STATUS = (402, 429)
+
+_PRIORITY: ContextVar[str] = ContextVar("finmind_priority", default=USER)
+
+
+class FinMindError(Exception):
+    """FinMind 請求失敗（HTTP 錯誤 / 回應異常）"""
+
+
+class FinMindThrottled(FinMindError):
+    """額度不足：本機限流拿不到 token，或 FinMind 回 402/429 且重試後仍失敗"""
+
+
+@contextmanager
+def background():
+    """區塊內的 FinMind 請求以背景優先度送出（背景執行緒的迴圈包一層即可）"""
+    token = _PRIORITY.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        _PRIORITY.reset(token)
+
+
+class RateLimiter:
+    """
+    Token bucket：每秒補 rate 個 token，最多存 capacity 個。
+    - 使用者請求有 token 就拿；背景請求只在 bucket 高於保留量、且沒有使用者在排隊時才拿
+    - 收到 402/429 時整個 bucket 暫停到 blocked_until（jittered exponential backoff）
+    - 另外記錄最近一小時實際送出的請求數，換算剩餘額度
+    """
+
+    def __init__(self, per_hour: int, burst: int):
+        self.per_hour = per_hour
+        self.rate = per_hour / 3600.0
+        self.capacity = float(max(1, burst))
+        self.tokens = self.capacity
+        self.blocked_until = 0.0
+        self._updated = time.monotonic()
+        self._users_waiting = 0
+        self._sent: deque = deque()  # 最近一小時的送出時間（time.time()）
+        self._cond = threading.Condition()
+
+    def _refill(self, now: float):
+        if self.rate <= 0:  # per_hour = 0：不做本機限流，只保留 402/429 退避
+            self.tokens = self.capacity
+            return
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _can_take(self, priority: str) -> bool:
+        if priority == USER:
+            return self.tokens >= 1
+        return self._users_waiting == 0 and self.tokens >= 1 + self.capacity * BACKGROUND_RESERVE
+
+    def acquire(self, priority: str, max_wait: float) -> bool:
+        deadline = time.monotonic() + max_wait
+        with self._cond:
+            if priority == USER:
+                self._users_waiting += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    wall = time.time()
+                    if wall >= self.blocked_until and self._can_take(priority):
+                        self.tokens -= 1
+                        self._sent.append(wall)
+                        return True
+                    if now >= deadline:
+                        return False
+                    # 等到下一個 token / 解除封鎖 / 有人釋出（最多等到 deadline）
+                    need = max(1.0 - self.tokens, 0.0) / self.rate if self.rate > 0 else 0.0
+                    wait = max(need, self.blocked_until - wall, 0.05)
+                    self._cond.wait(min(wait, deadline - now))
+            finally:
+                if priority == USER:
+                    self._users_waiting -= 1
+                    self._cond.notify_all()
+
+    def penalize(self, status: int, attempt: int, retry_after: Optional[float] = None) -> float:
+        """402/429 → 暫停整個 bucket；回傳這次的等待秒數"""
+        if retry_after is None:
+            base, cap = BACKOFF_BASE.get(status, 2.0), BACKOFF_CAP.get(status, 60.0)
+            retry_after = min(cap, base * (2 ** attempt)) * random.uniform(0.5, 1.0)
+        with self._cond:
+            self.blocked_until = max(self.blocked_until, time.time() + retry_after)
+            if status == 402:
+                self.tokens = 0.0  # 方案額度已用完：本機計數也歸零，等 FinMind 解除
+            self._cond.notify_all()
+        return retry_after
+
+    def quota(self) -> Dict[str, Any]:
+        with self._cond:
+            now = time.time()
+            while self._sent and self._sent[0] <= now - 3600:
+                self._sent.popleft()
+            self._refill(time.monotonic())
+            used = len(self._sent)
+            return {
+                "limit_per_hour": self.per_hour,
+                "used_last_hour": used,
+                # per_hour = 0：不做本機限流，剩餘額度視為無上限
+                "remaining": max(0, self.per_hour - used) if self.rate > 0 else math.inf,
+                "tokens": round(self.tokens, 2),
+                "throttled_for": round(max(0.0, self.blocked_until - now), 1),
+            }
+
+
+LIMITER = RateLimiter(FINMIND_REQUESTS_PER_HOUR, FINMIND_BURST)
+
+metrics.describe("finmind_wait_seconds", "histogram", "Time spent waiting for a FinMind rate-limit token, by priority.")
+metrics.describe("finmind_requests_total", "counter", "FinMind API requests sent, by priority.")
+metrics.describe("finmind_throttled_total", "counter", "FinMind calls rejected by the local limiter or by FinMind (402/429).")
+metrics.describe("finmind_quota_remaining", "gauge", "Estimated FinMind requests left in the rolling hour.")
+metrics.register_gauge("finmind_quota_remaining", lambda: {(): LIMITER.quota()["remaining"]})
+
+
+def quota() -> Dict[str, Any]:
+    """目前額度狀態：每小時上限、最近一小時已用、剩餘、bucket token、還要暫停幾秒"""
+    return LIMITER.quota()
+
+
+def _retry_after(res) -> Optional[float]:
+    value = res.headers.get("Retry-After")
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+def get_data(dataset: str, data_id: Optional[str] = None, start_date: Optional[str] = None,
+             end_date: Optional[str] = None, token: Optional[str] = None, timeout: float = 10,
+             priority: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    查詢 FinMind /api/v4/data，回傳 data 陣列。
+    - priority 未指定時依呼叫端 context（background() 區塊內為背景，其餘為使用者）
+    - 拿不到額度或重試後仍被 402/429 → FinMindThrottled；其他 HTTP 錯誤 → FinMindError
+    """
+    priority = priority or _PRIORITY.get()
+    params = {"dataset": dataset}
+    if data_id:
+        params["data_id"] = data_id
+    if start_date:
+        params["start_date"] = start_date
+    if end_date:
+        params["end_date"] = end_date
+    headers = {"Authorization": f"Bearer {token or FINMIND_API_KEY}"}
+    max_wait = USER_MAX_WAIT if priority == USER else BACKGROUND_MAX_WAIT
+
+    for attempt in range(MAX_RETRIES[priority] + 1):
+        t0 = time.perf_counter()
+        acquired = LIMITER.acquire(priority, max_wait)
+        metrics.observe("finmind_wait_seconds", time.perf_counter() - t0, priority=priority)
+        if not acquired:
+            metrics.inc("finmind_throttled_total", reason="local", priority=priority)
+            log.warning("[FINMIND] ⏳ 額度不足，%s 請求放棄 %s/%s（剩餘 %s）",
+                        priority, dataset, data_id, LIMITER.quota()["remaining"])
+            raise FinMindThrottled(f"FinMind 本機限流：{dataset} {data_id or ''}")
+
+        metrics.inc("finmind_requests_total", priority=priority)
+        # 不用 urllib3 自動重試：每次實際送出都要先拿 token，剩餘額度才算得準
+        res = http_client.get(API_URL, params=params, headers=headers, timeout=timeout, retry=False)
+        if res.status_code in THROTTLE_STATUS:
+            metrics.inc("finmind_throttled_total", reason=str(res.status_code), priority=priority)
+            delay = LIMITER.penalize(res.status_code, attempt, _retry_after(res))
+            log.warning("[FINMIND] 🚦 FinMind 回 %d（%s %s），暫停 %.1f 秒（第 %d 次）",
+                        res.status_code, dataset, data_id, delay, attempt + 1)
+            # 使用者請求：等待時間超過自己的預算就不重試，直接降級
+            if priority == USER and delay > max_wait:
+                break
+            continue
+        if res.status_code >= 400:
+            raise FinMindError(f"FinMind HTTP {res.status_code}：{dataset} {data_id or ''}")
+        return res.json().get("data") or []
+
+    raise FinMindThrottled(f"FinMind 額度受限：{dataset} {data_id or ''}")
@@ -3,22 +3,46 @@ from __future__ import annotations
 
 import re
 import time
-from typing import Dict, List, Tuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, List, Optional
 
-import requests
-from bs4 import BeautifulSoup
 from urllib.parse import urlparse
 
-# 簡單的 in-memory cache，避免同一篇文章一直抓
-_FULLTEXT_CACHE: Dict[str, Dict] = {}
-_FULLTEXT_TTL_SECONDS = 60 * 60  # 1 hour
+from config import FULLTEXT_PARSER
+from retrievers import http_client
+from retrievers.ttl_cache import TTLCache
+from retrievers.persist import lazy_store
+from retrievers.singleflight import SingleFlight
+from retrievers.extract import extract_main_text, resolve_backend
+from retrievers.ranking import bm25_scores, top_indices, tokenize
+from retrievers.logs import get_logger
+
+log = get_logger("fulltext")
 
-_UA = (
-    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-    "AppleWebKit/537.36 (KHTML, like Gecko) "
-    "Chrome/120.0.0.0 Safari/537.36"
+# in-memory cache（LRU + TTL + 容量上限），避免同一篇文章一直抓
+# 值為 {"text", "etag", "last_modified"}；過期後在 stale 寬限內仍保留，用驗證資訊做條件式 GET
+_FULLTEXT_TTL_SECONDS = 60 * 60  # 1 hour
+_FULLTEXT_STALE_SECONDS = 24 * 60 * 60
+_FULLTEXT_CACHE = TTLCache(
+    "fulltext", ttl=_FULLTEXT_TTL_SECONDS, max_entries=500, max_bytes=32 * 1024 * 1024,
+    backend=lazy_store(),  # CACHE_DB_PATH 有設定時，萃取後的全文會寫入磁碟
+    stale_ttl=_FULLTEXT_STALE_SECONDS,
 )
 
+# 下載限制：串流讀取，超過上限就截斷（新聞頁常有數 MB 的廣告/JS，但主文只取 max_chars 字）
+_MAX_DOWNLOAD_BYTES = 2 * 1024 * 1024
+_CHUNK_BYTES = 64 * 1024
+_HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml")
+_META_CHARSET_RE = re.compile(rb"""<meta[^>]+charset=["']?\s*([a-zA-Z0-9_-]+)""", re.I)
+
+# Top-k 全文並行抓取：共用一個 wall-clock deadline，逾時的文章直接放棄
+_FULLTEXT_DEADLINE_SECONDS = 6.0
+_FETCH_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="fulltext")
+_FULLTEXT_FLIGHT = SingleFlight("fulltext")  # 同一篇文章同時只下載一次
+
+# HTML 解析後端（啟動時決定一次；指定的後端未安裝會自動退回）
+_PARSER = resolve_backend(FULLTEXT_PARSER)
+
 
 def _now() -> float:
     return time.time()
@@ -30,30 +54,6 @@ def _normalize_ws(s: str) -> str:
     return s.strip()
 
 
-def _tokenize(text: str) -> List[str]:
-    """
-    兼容中英：把「中文連續字 / 英數單字」都當 token。
-    """
-    tokens = re.findall(r"[A-Za-z0-9_]+|[\u4e00-\u9fff]{1,}", text)
-    # 去掉太短的 token（例如單一字很容易太雜）
-    out = []
-    for t in tokens:
-        t = t.strip().lower()
-        if len(t) <= 1:
-            continue
-        out.append(t)
-    return out
-
-
-def _overlap_score(query_tokens: List[str], doc_text: str) -> int:
-    """
-    超輕量打分：query token 出現幾次（重疊數量）
-    """
-    if not query_tokens or not doc_text:
-        return 0
-    dt = doc_text.lower()
-    return sum(1 for t in query_tokens if t in dt)
-
 def _looks_like_article(url: str) -> bool:
     if not url:
         return False
@@ -72,45 +72,87 @@ def _looks_like_article(url: str) -> bool:
 def fetch_fulltext(url: str, timeout: int = 10, max_chars: int = 20000) -> str:
     """
     抓網頁並萃取可讀文字。失敗回傳空字串。
+    TTL 內直接回快取；過期但仍在 stale 寬限內時帶 ETag / Last-Modified 重新驗證，304 就沿用舊文字。
     """
     if not url:
         return ""
 
-    # cache hit
-    item = _FULLTEXT_CACHE.get(url)
-    if item and _now() < item["expires_at"]:
-        return item["text"]
+    cached, fresh = _FULLTEXT_CACHE.get_stale(url)
+    if cached is not None and fresh:
+        return _cached_text(cached)
+    return _FULLTEXT_FLIGHT.do(url, _download_fulltext, url, timeout, max_chars, cached)
+
+
+def _cached_text(entry) -> str:
+    # 舊版快取（含持久層）存的是純字串
+    return entry if isinstance(entry, str) else entry.get("text", "")
 
+
+def _decode_html(raw: bytes, resp) -> str:
+    """編碼優先序：Content-Type charset → <meta charset> → UTF-8（錯字元以替代字元保留）"""
+    encoding = None
+    if "charset=" in (resp.headers.get("Content-Type") or "").lower():
+        encoding = resp.encoding
+    if not encoding:
+        m = _META_CHARSET_RE.search(raw[:4096])
+        if m:
+            encoding = m.group(1).decode("ascii", "ignore")
     try:
-        resp = requests.get(
-            url,
-            timeout=timeout,
-            headers={"User-Agent": _UA, "Accept-Language": "zh-TW,zh;q=0.9,en;q=0.8"},
-        )
-        resp.raise_for_status()
+        return raw.decode(encoding or "utf-8", errors="replace")
+    except LookupError:
+        return raw.decode("utf-8", errors="replace")
+
+
+def _read_capped(resp) -> bytes:
+    buf = bytearray()
+    for chunk in resp.iter_content(chunk_size=_CHUNK_BYTES):
+        buf.extend(chunk)
+        if len(buf) >= _MAX_DOWNLOAD_BYTES:
+            del buf[_MAX_DOWNLOAD_BYTES:]
+            break
+    return bytes(buf)
+
+
+def _download_fulltext(url: str, timeout: int, max_chars: int, stale=None) -> str:
+    # 有舊資料的驗證資訊 → 條件式 GET
+    headers = {}
+    if isinstance(stale, dict):
+        if stale.get("etag"):
+            headers["If-None-Match"] = stale["etag"]
+        if stale.get("last_modified"):
+            headers["If-Modified-Since"] = stale["last_modified"]
+
+    try:
+        # User-Agent / Accept-Language 由共用 Session 的預設 headers 帶入
+        resp = http_client.get(url, headers=headers or None, timeout=timeout, stream=True)
     except Exception:
-        return ""
+        # 網路錯誤：有舊資料就先沿用（不延長效期，下次仍會重新驗證）
+        return _cached_text(stale) if stale is not None else ""
 
-    html = resp.text or ""
-    if not html:
-        return ""
+    try:
+        if resp.status_code == 304 and isinstance(stale, dict):
+            # 內容沒變：沿用舊文字，只延長效期
+            _FULLTEXT_CACHE.set(url, stale)
+            return stale.get("text", "")
 
-    soup = BeautifulSoup(html, "html.parser")
+        resp.raise_for_status()
 
-    # 移除干擾
-    for tag in soup(["script", "style", "noscript", "header", "footer", "nav", "aside"]):
-        tag.decompose()
+        ctype = (resp.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+        if ctype and ctype not in _HTML_CONTENT_TYPES:
+            return ""  # PDF / 圖片 / JSON 等非 HTML，不下載內容
 
-    # 優先取 <article>
-    main = soup.find("article")
-    if main is None:
-        # 次選：main/content/body
-        main = soup.find("main") or soup.find(attrs={"id": "content"}) or soup.body
+        raw = _read_capped(resp)
+    except Exception:
+        return ""
+    finally:
+        resp.close()
 
-    if main is None:
+    if not raw:
         return ""
+    html = _decode_html(raw, resp)
 
-    text = main.get_text(separator="\n")
+    # 主文萃取（selectolax / lxml / bs4 依 FULLTEXT_PARSER 設定）
+    text = extract_main_text(html, _PARSER)
     text = _normalize_ws(text)
 
     # 太短通常是擋爬/空殼頁
@@ -120,42 +162,41 @@ def fetch_fulltext(url: str, timeout: int = 10, max_chars: int = 20000) -> str:
     if len(text) > max_chars:
         text = text[:max_chars]
 
-    _FULLTEXT_CACHE[url] = {"text": text, "expires_at": _now() + _FULLTEXT_TTL_SECONDS}
+    _FULLTEXT_CACHE.set(url, {
+        "text": text,
+        "etag": resp.headers.get("ETag"),
+        "last_modified": resp.headers.get("Last-Modified"),
+    })
     return text
 
 
 def select_topk_by_title(query: str, news_list: List[Dict], k: int = 3) -> List[int]:
     """
-    只用「title」做 lazy rerank：挑最相關的 TopK（回傳 index，0-based）
+    只用「title」做 lazy rerank：BM25 挑最相關的 TopK（回傳 index，0-based）
     """
-    q_tokens = _tokenize(query)
-    scored: List[Tuple[int, int]] = []
-    for i, n in enumerate(news_list):
-        title = (n.get("title") or "").strip()
-        if not title:
-            continue
-        score = _overlap_score(q_tokens, title)
-        scored.append((score, i))
+    titled = [(i, (n.get("title") or "").strip()) for i, n in enumerate(news_list)]
+    titled = [(i, t) for i, t in titled if t]
+    if not titled:
+        return []
 
-    scored.sort(key=lambda x: (x[0], -x[1]), reverse=True)
-    top = [i for score, i in scored[:k] if score > 0]
+    scores = bm25_scores(query, [t for _, t in titled])
+    top = [titled[j][0] for j in top_indices(scores, k)]
 
     # 如果 query token 在標題都打不到（很常見），就退回拿前 k 篇（但仍避免空 title）
     if not top:
-        top = [i for i, n in enumerate(news_list) if (n.get("title") or "").strip()][:k]
+        top = [i for i, _ in titled[:k]]
 
     return top
 
 
 def extract_top_snippets(query: str, fulltext: str, max_snippets: int = 2) -> List[str]:
     """
-    從全文中切出最相關的片段（超輕量：滑動視窗 + token overlap）
+    從全文中切出最相關的片段（段落 BM25；段落都打不到時改用滑動視窗）
     """
     if not fulltext:
         return []
 
-    q_tokens = _tokenize(query)
-    if not q_tokens:
+    if not tokenize(query):
         return []
 
     # 先分段（以空行）
@@ -166,30 +207,24 @@ def extract_top_snippets(query: str, fulltext: str, max_snippets: int = 2) -> Li
     if not paras:
         return []
 
-    scored: List[Tuple[int, str]] = []
-    for p in paras:
-        score = _overlap_score(q_tokens, p)
-        if score <= 0:
-            continue
-        scored.append((score, p))
+    candidates = paras
+    picked = top_indices(bm25_scores(query, candidates), len(candidates))
 
     # 如果段落打不到，就退一步用整篇做 windows
-    if not scored:
+    if not picked:
         text = fulltext
         window = 360
         stride = 180
+        candidates = []
         for start in range(0, max(1, len(text) - window), stride):
             chunk = text[start : start + window].strip()
-            if len(chunk) < 120:
-                continue
-            score = _overlap_score(q_tokens, chunk)
-            if score > 0:
-                scored.append((score, chunk))
+            if len(chunk) >= 120:
+                candidates.append(chunk)
+        picked = top_indices(bm25_scores(query, candidates), len(candidates))
 
-    scored.sort(key=lambda x: x[0], reverse=True)
     out: List[str] = []
-    for score, s in scored:
-        s = _normalize_ws(s)
+    for i in picked:
+        s = _normalize_ws(candidates[i])
         # 控制輸入長度（避免 context 爆掉）
         if len(s) > 380:
             s = s[:380] + "..."
@@ -200,20 +235,55 @@ def extract_top_snippets(query: str, fulltext: str, max_snippets: int = 2) -> Li
     return out
 
 
-def lazy_fulltext_topk(rank_query: str, snippet_query: str, news_list: List[Dict], k: int = 3) -> Dict[int, List[str]]:
+def lazy_fulltext_topk(
+    rank_query: str,
+    snippet_query: str,
+    news_list: List[Dict],
+    k: int = 3,
+    deadline_s: float = _FULLTEXT_DEADLINE_SECONDS,
+    texts: Optional[Dict[str, str]] = None,
+) -> Dict[int, List[str]]:
+    """
+    Top-k 全文並行抓取：所有文章同時送出，共用 deadline_s 秒的總時限。
+    deadline 內完成的文章照常抽摘錄；來不及的直接略過（背景執行緒抓完仍會寫入快取）。
+    texts：已預先萃取的全文 {url: 全文}（背景收錄），命中的文章不再下載。
+    """
     top_idx_0 = select_topk_by_title(rank_query, news_list, k=k)
     result: Dict[int, List[str]] = {}
 
+    deadline = _now() + deadline_s
+    # 單篇 timeout 不超過總時限，避免慢站佔住 worker 太久
+    per_fetch_timeout = max(1, min(10, int(deadline_s + 0.999)))
+
+    pending = {}
     for i0 in top_idx_0:
         n = news_list[i0]
         url = (n.get("url") or "").strip()
         if (not url) or (not _looks_like_article(url)):
             continue
+        if texts and texts.get(url):
+            snippets = extract_top_snippets(snippet_query, texts[url], max_snippets=2)
+            if snippets:
+                result[i0 + 1] = snippets
+            continue
+        pending[_FETCH_POOL.submit(fetch_fulltext, url, per_fetch_timeout)] = i0
 
-        text = fetch_fulltext(url)
-        snippets = extract_top_snippets(snippet_query, text, max_snippets=2)
-        if snippets:
-            result[i0 + 1] = snippets
+    while pending:
+        remaining = deadline - _now()
+        if remaining <= 0:
+            break
+        done, _ = wait(pending.keys(), timeout=remaining, return_when=FIRST_COMPLETED)
+        for fut in done:
+            i0 = pending.pop(fut)
+            try:
+                text = fut.result()
+            except Exception:
+                continue
+            snippets = extract_top_snippets(snippet_query, text, max_snippets=2)
+            if snippets:
+                result[i0 + 1] = snippets
 
-    return result
+    if pending:
+        log.info("[FULLTEXT] ⏱️ 全文抓取超過 %.1f 秒，略過 %d 篇未完成文章。", deadline_s, len(pending))
 
+    return result
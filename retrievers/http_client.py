@@ -0,0 +1,165 @@
+# retrievers/http_client.py（共用 HTTP 連線池：keep-alive + 重試 + 預設 timeout）
+import threading
+import time
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+from retrievers import metrics
+
+# === 連線池設定 ===
+POOL_CONNECTIONS = 20    # 最多保留幾個 host 的連線池
+POOL_MAXSIZE = 16        # 每個 host 最多保留幾條 keep-alive 連線
+DEFAULT_TIMEOUT = 10     # 秒；呼叫端沒指定 timeout 時使用
+RETRY_TOTAL = 2         # 只重試連線失敗與 5xx；讀取逾時不重送（否則實際耗時會變成 timeout 的數倍）
+RETRY_BACKOFF = 0.3
+RETRY_STATUS = (500, 502, 503, 504)
+
+DEFAULT_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/120.0.0.0 Safari/537.36"
+    ),
+    "Accept-Language": "zh-TW,zh;q=0.9,en;q=0.8",
+}
+
+# retry=True：一般上游（連線失敗 / 5xx 自動重試）；retry=False：呼叫端自己控管重試（FinMind 限流器要算到每一次請求）
+_SESSIONS: Dict[bool, requests.Session] = {}
+_LOCK = threading.Lock()
+
+# 連線池統計：{"scheme://host": {"requests": n, "new_connections": n}}，自己計數，不讀 urllib3 內部狀態
+_STATS: Dict[str, Dict[str, int]] = {}
+_STATS_LOCK = threading.Lock()
+
+
+def _count(host: str, field: str):
+    with _STATS_LOCK:
+        h = _STATS.setdefault(host, {"requests": 0, "new_connections": 0})
+        h[field] += 1
+
+
+class _CountingPoolMixin:
+    """每次連線池真的新建連線（pool miss）時記一筆"""
+
+    def _new_conn(self):
+        _count(f"{self.scheme}://{self.host}", "new_connections")
+        return super()._new_conn()
+
+
+class _CountingHTTPConnectionPool(_CountingPoolMixin, HTTPConnectionPool):
+    pass
+
+
+class _CountingHTTPSConnectionPool(_CountingPoolMixin, HTTPSConnectionPool):
+    pass
+
+
+class _CountingAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _CountingHTTPConnectionPool,
+            "https": _CountingHTTPSConnectionPool,
+        }
+
+
+def _build_session(retry: bool = True):
+    if retry:
+        retries = Retry(
+            total=RETRY_TOTAL,
+            connect=RETRY_TOTAL,
+            read=False,  # 讀取逾時直接拋出（requests.ReadTimeout），不重送
+            other=0,
+            status=RETRY_TOTAL,
+            backoff_factor=RETRY_BACKOFF,
+            status_forcelist=RETRY_STATUS,
+            allowed_methods=frozenset(["GET", "HEAD"]),
+            raise_on_status=False,
+        )
+    else:
+        retries = Retry(0, read=False)  # 與 requests 預設相同：不重試
+    adapter = _CountingAdapter(
+        pool_connections=POOL_CONNECTIONS,
+        pool_maxsize=POOL_MAXSIZE,
+        max_retries=retries,
+        pool_block=False,
+    )
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session(retry: bool = True) -> requests.Session:
+    """取得全域共用 Session（第一次呼叫時建立；requests/urllib3 的連線池本身為 thread-safe）"""
+    session = _SESSIONS.get(retry)
+    if session is None:
+        with _LOCK:
+            session = _SESSIONS.get(retry)
+            if session is None:
+                session = _SESSIONS[retry] = _build_session(retry)
+    return session
+
+
+def get(url: str, params: Optional[Dict[str, Any]] = None, headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None, retry: bool = True, **kwargs) -> requests.Response:
+    """
+    所有 retriever 統一走這裡發 GET；沒給 timeout 就套用 DEFAULT_TIMEOUT。
+    retry=False 時不做任何自動重試（一次呼叫 = 一次上游請求）。
+    每個請求依 host 記錄延遲、逾時 / 連線失敗 / 4xx / 5xx 次數（/metrics）。
+    """
+    session = get_session(retry)
+    parsed = urlparse(url)
+    host = parsed.netloc
+    _count(f"{parsed.scheme}://{parsed.hostname}", "requests")
+    metrics.inc("upstream_requests_total", host=host)
+    t0 = time.perf_counter()
+    try:
+        resp = session.get(
+            url,
+            params=params,
+            headers=headers,
+            timeout=DEFAULT_TIMEOUT if timeout is None else timeout,
+            **kwargs,
+        )
+    except requests.Timeout:
+        metrics.inc("upstream_errors_total", host=host, kind="timeout")
+        raise
+    except requests.ConnectionError:
+        metrics.inc("upstream_errors_total", host=host, kind="connection")
+        raise
+    except requests.RequestException:
+        metrics.inc("upstream_errors_total", host=host, kind="error")
+        raise
+    finally:
+        metrics.observe("upstream_request_seconds", time.perf_counter() - t0, host=host)
+    if resp.status_code >= 400:
+        metrics.inc("upstream_errors_total", host=host, kind=f"http_{resp.status_code // 100}xx")
+    return resp
+
+
+def pool_stats() -> Dict[str, Any]:
+    """
+    連線池統計：
+    - new_connections：實際新建的 TCP(+TLS) 連線數（pool miss）
+    - reused：沿用既有 keep-alive 連線的請求數（pool hit）
+    - hosts：各 host 的 {requests, new_connections}
+    """
+    with _STATS_LOCK:
+        hosts = {h: dict(v) for h, v in _STATS.items()}
+    total_req = sum(h["requests"] for h in hosts.values())
+    total_conn = sum(h["new_connections"] for h in hosts.values())
+    reused = max(0, total_req - total_conn)
+    return {
+        "requests": total_req,
+        "new_connections": total_conn,
+        "reused": reused,
+        "hit_ratio": round(reused / total_req, 3) if total_req else 0.0,
+        "hosts": hosts,
+    }
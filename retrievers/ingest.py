@@ -0,0 +1,122 @@
+# retrievers/ingest.py（背景新聞收錄：定期抓觀察清單 / 熱門代號的新聞與全文，存到本機）
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from config import (
+    FINMIND_API_KEY, HOT_TICKERS_TOP_N, NEWS_INGEST_INTERVAL, NEWS_INGEST_WATCHLIST,
+)
+from retrievers import cache as source_cache
+from retrievers import finmind
+from retrievers.news import fetch_news_finmind, fetch_news_rss
+from retrievers.merge_utils import merge_news
+from retrievers.fulltext import fetch_fulltext, select_topk_by_title
+from retrievers.ttl_cache import TTLCache
+from retrievers.persist import lazy_store
+from retrievers.leader import election
+
+FULLTEXT_TOP_K = 3  # 與 rag.py 的 Lazy Full-Text Top3 相同
+
+# 收錄結果：ticker → {"company_name", "finmind_news", "rss_news", "fulltext": {url: 全文}, "updated_at"}
+# 有效期為收錄間隔的 3 倍：背景連續失敗兩輪才會讓查詢退回即時抓取
+INGEST_STORE = TTLCache(
+    "ingest", ttl=max(NEWS_INGEST_INTERVAL, 60) * 3, max_entries=500, max_bytes=64 * 1024 * 1024,
+    backend=lazy_store(),  # CACHE_DB_PATH / SHARED_CACHE_URL 有設定時寫入持久層，重啟後或其他 worker 都能直接服務
+)
+
+_INGEST_STARTED = False
+
+
+def get_ingested(ticker: str) -> Optional[Dict[str, Any]]:
+    """查詢路徑用：回傳未過期的收錄結果，沒有就回傳 None（呼叫端改走即時抓取）"""
+    return INGEST_STORE.get(ticker)
+
+
+def ingest_targets() -> List[str]:
+    """有設定觀察清單就用觀察清單，否則用最常被查詢的前 N 檔"""
+    return list(NEWS_INGEST_WATCHLIST) or source_cache.hot_tickers(HOT_TICKERS_TOP_N)
+
+
+def _company_names() -> Dict[str, str]:
+    data = source_cache.FINMIND_CACHE.get("data") or []
+    return {
+        (item.get("stock_id") or "").strip(): (item.get("stock_name") or "").strip()
+        for item in data
+    }
+
+
+def ingest_ticker(ticker: str, company_name: Optional[str]) -> Optional[Dict[str, Any]]:
+    """抓一檔的 FinMind + RSS 新聞、合併去重，並預先下載 Top-k 文章全文"""
+    from rag import normalize_url, looks_like_article  # 延遲載入，避免循環 import
+
+    finmind_news = fetch_news_finmind(ticker, FINMIND_API_KEY, company_name=company_name) or []
+    rss_news = fetch_news_rss(company_name, ticker) if company_name else []
+    if not finmind_news and not rss_news:
+        return None
+
+    # 與 rag.py 相同：合併（含近似重複去除）後用「公司名 + 代號」挑 Top-k 標題
+    merged = merge_news(finmind_news, rss_news)
+    fulltext: Dict[str, str] = {}
+    for i in select_topk_by_title(f"{company_name} {ticker}", merged, k=FULLTEXT_TOP_K):
+        url = normalize_url((merged[i].get("url") or "").strip())
+        if not looks_like_article(url):
+            continue
+        text = fetch_fulltext(url)
+        if text:
+            fulltext[url] = text
+
+    record = {
+        "company_name": company_name,
+        "finmind_news": finmind_news,
+        "rss_news": rss_news,
+        "fulltext": fulltext,
+        "updated_at": time.time(),
+    }
+    INGEST_STORE.set(ticker, record)
+    return record
+
+
+def run_ingest_once():
+    targets = ingest_targets()
+    if not targets:
+        return
+    names = _company_names()
+    started_at = time.time()
+    ok = 0
+    with finmind.background():  # 收錄不搶使用者查詢的 FinMind 額度
+        for ticker in targets:
+            try:
+                if ingest_ticker(ticker, names.get(ticker)):
+                    ok += 1
+            except finmind.FinMindThrottled:
+                # 額度用完：保留既有收錄結果，剩下的代號等下一輪
+                print(f"[INGEST] 🚦 FinMind 額度受限，本輪在 {ticker} 停止收錄。")
+                break
+            except Exception as e:
+                print(f"[INGEST] ⚠️ 收錄 {ticker} 失敗：{e}")
+    print(f"[INGEST] 📥 新聞收錄完成：{ok}/{len(targets)} 檔，耗時 {time.time() - started_at:.1f} 秒"
+          f"（FinMind 剩餘額度 {finmind.quota()['remaining']}）。")
+
+
+def start_news_ingest():
+    """背景執行緒：每 NEWS_INGEST_INTERVAL 秒收錄一次（0 = 關閉）"""
+    global _INGEST_STARTED
+    if _INGEST_STARTED or NEWS_INGEST_INTERVAL <= 0:
+        return
+    _INGEST_STARTED = True
+
+    leader = election("news-ingest")  # 多 worker 時只由一個 worker 收錄，結果經共用快取給其他 worker
+
+    def loop():
+        source_cache.wait_until_ready()  # 需要股票清單才能把代號對到公司名
+        while True:
+            try:
+                if leader.is_leader():
+                    run_ingest_once()
+            except Exception as e:
+                print(f"[INGEST] ⚠️ 新聞收錄失敗：{e}")
+            time.sleep(NEWS_INGEST_INTERVAL)
+
+    threading.Thread(target=loop, name="news-ingest", daemon=True).start()
+    target_desc = f"觀察清單 {len(NEWS_INGEST_WATCHLIST)} 檔" if NEWS_INGEST_WATCHLIST else f"熱門前 {HOT_TICKERS_TOP_N} 檔"
+    print(f"[INGEST] 🚀 已啟動背景新聞收錄（{target_desc}，每 {NEWS_INGEST_INTERVAL} 秒）")
@@ -0,0 +1,115 @@
+# retrievers/leader.py（多 worker 選主：背景刷新只讓一個 worker 打 FinMind）
+import os
+import socket
+import threading
+import time
+from typing import Dict, Optional
+
+from config import SHARED_CACHE_URL
+from retrievers.logs import get_logger
+from retrievers.persist import RedisStore, SQLiteStore, get_store
+
+try:
+    import fcntl
+except ImportError:  # Windows 沒有 fcntl：退回「每個 process 都是 leader」
+    fcntl = None
+
+log = get_logger("leader")
+
+# 本 process 的識別（寫進 lease / 熱門代號統計）
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+LEASE_SECONDS = 120  # Redis lease 的有效期；leader 掛掉後最慢這麼久由別人接手
+HEARTBEAT_FRACTION = 1 / 3  # 取得 lease 後由 heartbeat 執行緒每 lease × 此比例續約一次
+
+
+class LeaderElection:
+    """
+    每個背景工作一個實例，迴圈每輪先呼叫 is_leader()：
+    - 未設定 SHARED_CACHE_URL：單一 process 部署，永遠是 leader（行為與以前相同）
+    - SQLite 共用快取：對 "<db>.<name>.lock" 取非阻塞的 flock；拿到後一直持有到 process 結束，
+      OS 會在 process 死掉時釋放鎖，其他 worker 下一輪就能接手
+    - Redis 共用快取：SET NX PX lease；取得後由 heartbeat 執行緒定期續約，
+      背景迴圈的 sleep 比 lease 長（市場股價表 600 秒、股票清單數天）也不會中途失效
+    """
+
+    def __init__(self, name: str, lease_s: float = LEASE_SECONDS):
+        self.name = name
+        self.lease_s = lease_s
+        self._fd: Optional[int] = None
+        self._pid: Optional[int] = None
+        self._was_leader = False
+        self._heartbeat: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def is_leader(self) -> bool:
+        with self._lock:
+            leader = self._check()
+            if leader != self._was_leader:
+                role = "leader" if leader else "follower"
+                log.info("[LEADER/%s] 👑 %s 成為 %s", self.name, WORKER_ID, role)
+                self._was_leader = leader
+            return leader
+
+    def _check(self) -> bool:
+        if not SHARED_CACHE_URL:
+            return True
+        store = get_store()
+        if isinstance(store, RedisStore):
+            try:
+                leader = store.acquire_lease(self.name, WORKER_ID, self.lease_s)
+            except Exception as e:
+                log.warning("[LEADER/%s] ⚠️ 無法取得 lease：%s", self.name, e)
+                return False
+            if leader:
+                self._start_heartbeat(store)
+            return leader
+        if isinstance(store, SQLiteStore):
+            return self._flock(f"{store.path}.{self.name}.lock")
+        return True  # 共用快取開啟失敗 → 各自為政，至少功能正常
+
+    def _start_heartbeat(self, store: RedisStore):
+        if self._heartbeat is not None and self._heartbeat.is_alive():
+            return
+        self._heartbeat = threading.Thread(
+            target=self._renew_loop, args=(store,), name=f"lease-{self.name}", daemon=True
+        )
+        self._heartbeat.start()
+
+    def _renew_loop(self, store: RedisStore):
+        """持續續約到 lease 被別人拿走為止；Redis 暫時連不上就下一輪再試（lease 仍有效到期滿）"""
+        interval = self.lease_s * HEARTBEAT_FRACTION
+        while True:
+            time.sleep(interval)
+            try:
+                if not store.acquire_lease(self.name, WORKER_ID, self.lease_s):
+                    log.warning("[LEADER/%s] ⚠️ %s 的 lease 已被其他 worker 取得，停止續約", self.name, WORKER_ID)
+                    return
+            except Exception as e:
+                log.warning("[LEADER/%s] ⚠️ lease 續約失敗：%s", self.name, e)
+
+    def _flock(self, path: str) -> bool:
+        if fcntl is None:
+            return True
+        if self._fd is not None and self._pid == os.getpid():
+            return True  # 已持有
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._fd, self._pid = fd, os.getpid()
+        return True
+
+
+_ELECTIONS: Dict[str, LeaderElection] = {}
+_ELECTIONS_LOCK = threading.Lock()
+
+
+def election(name: str) -> LeaderElection:
+    """同一個名稱在 process 內共用同一個 LeaderElection"""
+    with _ELECTIONS_LOCK:
+        if name not in _ELECTIONS:
+            _ELECTIONS[name] = LeaderElection(name)
+        return _ELECTIONS[name]
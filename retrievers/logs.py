@@ -0,0 +1,153 @@
+# retrievers/logs.py（結構化 logging：分級 + 請求欄位 + 佇列非同步輸出 + 逐筆 debug 取樣）
+import atexit
+import copy
+import json
+import logging
+import queue
+import random
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+
+from retrievers import metrics
+
+ROOT_LOGGER = "linebot"
+QUEUE_SIZE = 10000  # 佇列滿了就丟棄（寧可少 log，也不讓請求執行緒卡在 stdout）
+
+# 目前請求的欄位（request_id / ticker / started_at…）；各 thread / contextvars.Context 各自一份
+_CONTEXT: ContextVar[Dict[str, Any]] = ContextVar("log_context", default={})
+
+_LISTENER: Optional[QueueListener] = None
+_SAMPLE_RATE = 1.0
+
+metrics.describe("log_dropped_total", "counter", "Log records dropped because the logging queue was full.")
+
+
+def get_logger(name: str) -> logging.Logger:
+    """各模組用 get_logger("news") → linebot.news；未呼叫 setup_logging() 時只有 WARNING 以上會輸出"""
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+# ---------------------------------------------------------
+# 請求欄位
+# ---------------------------------------------------------
+def new_request_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+@contextmanager
+def log_context(**fields):
+    """區塊內所有 log 自動帶上這些欄位；離開時還原（webhook 每個事件包一層）"""
+    token = _CONTEXT.set({**_CONTEXT.get(), **fields})
+    try:
+        yield
+    finally:
+        _CONTEXT.reset(token)
+
+
+def bind(**fields):
+    """在目前的 log_context 內追加欄位（例如公司辨識完成後補上 ticker）"""
+    _CONTEXT.set({**_CONTEXT.get(), **fields})
+
+
+class _ContextFilter(logging.Filter):
+    """在呼叫端 thread 把 contextvars 欄位與 elapsed_ms 抄進 record（佇列另一端讀不到 contextvars）"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        ctx = _CONTEXT.get()
+        fields = {k: v for k, v in ctx.items() if k != "started_at"}
+        if "started_at" in ctx:
+            fields["elapsed_ms"] = int((time.time() - ctx["started_at"]) * 1000)
+        fields.update(getattr(record, "fields", None) or {})
+        record.fields = fields
+        return True
+
+
+class _SamplingFilter(logging.Filter):
+    """帶 extra={"sampled": True} 的逐筆 debug log 只保留 LOG_DEBUG_SAMPLE_RATE 比例"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, "sampled", False) and _SAMPLE_RATE < 1.0:
+            return random.random() < _SAMPLE_RATE
+        return True
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        只在呼叫端合併 msg % args（args 可能之後被改動），不做格式化；
+        保留 exc_info，traceback 由 listener 端的 formatter 產生（JSON 輸出在 "exc" 欄位）
+        """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.inc("log_dropped_total")
+
+
+# ---------------------------------------------------------
+# 輸出格式
+# ---------------------------------------------------------
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            line += "  " + " ".join(f"{k}={v}" for k, v in fields.items())
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        doc = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        doc.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            doc["exc"] = self.formatException(record.exc_info)
+        return json.dumps(doc, ensure_ascii=False, default=str)
+
+
+# ---------------------------------------------------------
+# 初始化
+# ---------------------------------------------------------
+def setup_logging(level: str = "INFO", fmt: str = "text", sample_rate: float = 1.0):
+    """
+    安裝佇列式 handler：請求執行緒只做 put_nowait，格式化與寫 stdout 由背景 listener 負責。
+    重複呼叫只會更新等級與取樣率。
+    """
+    global _LISTENER, _SAMPLE_RATE
+    _SAMPLE_RATE = max(0.0, min(1.0, sample_rate))
+    root = logging.getLogger(ROOT_LOGGER)
+    root.setLevel(getattr(logging, str(level).upper(), logging.INFO))
+    if _LISTENER is not None:
+        return
+
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+    q: "queue.Queue" = queue.Queue(maxsize=QUEUE_SIZE)
+    handler = _NonBlockingQueueHandler(q)
+    handler.addFilter(_SamplingFilter())
+    handler.addFilter(_ContextFilter())
+
+    root.handlers[:] = [handler]
+    root.propagate = False
+    _LISTENER = QueueListener(q, stream, respect_handler_level=False)
+    _LISTENER.start()
+    atexit.register(_LISTENER.stop)  # 結束前把佇列內剩下的 log 寫完
+
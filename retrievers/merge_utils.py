@@ -1,64 +1,83 @@
 # retrievers/merge_utils.py（含 LOG 版）
+import logging
 from typing import List, Dict
 
-def merge_news(finmind_news: List[Dict], rss_news: List[Dict], take_each: int = 4, cap: int = 8) -> List[Dict]:
-    print("[LOG/NewsMerge] 🧩 開始合併 FinMind + Google RSS 新聞")
-    print(f"[LOG/NewsMerge] FinMind 原始數量：{len(finmind_news)}，RSS 原始數量：{len(rss_news)}")
+from config import NEWS_DEDUP_THRESHOLD
+from retrievers.dedup import cluster_near_duplicates
+from retrievers.logs import get_logger
 
-    # 標記來源
-    f_sub = []
-    for n in finmind_news[:take_each]:
-        n = dict(n)
-        n["_source_tag"] = "finmind"
-        n.setdefault("source", "FinMind")
-        f_sub.append(n)
-    print(f"[LOG/NewsMerge] 已取 FinMind 前 {len(f_sub)} 則")
+log = get_logger("merge")
+
+
+def _interleave(a: List[Dict], b: List[Dict]) -> List[Dict]:
+    out = []
+    for i in range(max(len(a), len(b))):
+        if i < len(a):
+            out.append(a[i])
+        if i < len(b):
+            out.append(b[i])
+    return out
 
-    r_sub = []
-    for n in rss_news[:take_each]:
+
+def _tag(news: List[Dict], tag: str, default_source: str) -> List[Dict]:
+    out = []
+    for n in news:
         n = dict(n)
-        n["_source_tag"] = "rss"
-        n.setdefault("source", "Google RSS")
-        r_sub.append(n)
-    print(f"[LOG/NewsMerge] 已取 RSS 前 {len(r_sub)} 則")
+        n["_source_tag"] = tag
+        n.setdefault("source", default_source)
+        out.append(n)
+    return out
+
+
+def merge_news(finmind_news: List[Dict], rss_news: List[Dict], take_each: int = 4, cap: int = 8,
+               dedup_threshold: float = NEWS_DEDUP_THRESHOLD) -> List[Dict]:
+    log.debug("[LOG/NewsMerge] 🧩 開始合併 FinMind + Google RSS 新聞（FinMind 原始 %d 則，RSS 原始 %d 則）",
+              len(finmind_news), len(rss_news))
+
+    # 標記來源
+    f_sub = _tag(finmind_news[:take_each], "finmind", "FinMind")
+
+    r_sub = _tag(rss_news[:take_each], "rss", "Google RSS")
 
     # 資料不足互補
     if len(f_sub) < take_each and len(rss_news) > take_each:
         extra = take_each - len(f_sub)
         r_sub = rss_news[:take_each + extra]
-        print(f"[LOG/NewsMerge] ⚠️ FinMind 不足 {len(f_sub)} 則，從 RSS 補 {extra} 則（RSS 總數：{len(r_sub)}）")
+        log.debug("[LOG/NewsMerge] ⚠️ FinMind 不足 %d 則，從 RSS 補 %d 則（RSS 總數：%d）", len(f_sub), extra, len(r_sub))
 
     if len(r_sub) < take_each and len(finmind_news) > take_each:
         extra = take_each - len(r_sub)
         f_sub = finmind_news[:take_each + extra]
-        print(f"[LOG/NewsMerge] ⚠️ RSS 不足 {len(r_sub)} 則，從 FinMind 補 {extra} 則（FinMind 總數：{len(f_sub)}）")
+        log.debug("[LOG/NewsMerge] ⚠️ RSS 不足 %d 則，從 FinMind 補 %d 則（FinMind 總數：%d）", len(r_sub), extra, len(f_sub))
 
     # 交錯取樣
-    raw = []
-    m = max(len(f_sub), len(r_sub))
-    for i in range(m):
-        if i < len(f_sub):
-            raw.append(f_sub[i])
-        if i < len(r_sub):
-            raw.append(r_sub[i])
-    print(f"[LOG/NewsMerge] 🔄 交錯取樣完成，共 {len(raw)} 則候選新聞")
-
-    # 去重（以標題）
-    seen = set()
-    merged = []
-    for n in raw:
-        title = (n.get("title") or "").strip()
-        src = n.get("source", "") or "未知來源"
-        if not title:
-            print(f"[LOG/NewsMerge] ⚠️ 略過無標題新聞（來源：{src}）")
-            continue
-        if title in seen:
-            print(f"[LOG/NewsMerge] 🔁 偵測重複標題「{title}」，已略過（來源：{src}）")
+    raw = _interleave(f_sub, r_sub)
+
+    # 備用：兩邊剩下沒取到的新聞，近似重複被併掉後用來補位
+    leftovers = _interleave(
+        _tag(finmind_news[len(f_sub):], "finmind", "FinMind"),
+        _tag(rss_news[len(r_sub):], "rss", "Google RSS"),
+    )
+
+    candidates = []
+    for n in raw + leftovers:
+        if not (n.get("title") or "").strip():
+            log.debug("[LOG/NewsMerge] ⚠️ 略過無標題新聞（來源：%s）", n.get("source", "") or "未知來源")
             continue
-        seen.add(title)
-        merged.append(n)
+        candidates.append(n)
+
+    # 去重（近似重複分群：同一則通訊社稿被多家轉載只留第一則）
+    merged, dropped = cluster_near_duplicates(candidates, dedup_threshold, limit=cap)
+    if log.isEnabledFor(logging.DEBUG):
+        for n, rep, sim in dropped:
+            log.debug("[LOG/NewsMerge] 🔁 近似重複（%.2f）「%s」≈「%s」，已略過（來源：%s）",
+                      sim, n["title"], rep["title"], n.get("source", "") or "未知來源", extra={"sampled": True})
+    leftover_ids = {id(n) for n in leftovers}
+    backfilled = sum(1 for n in merged if id(n) in leftover_ids)
+    log.info("[LOG/NewsMerge] 🔄 合併完成：候選 %d 則，近似重複 %d 則，補位 %d 則 → %d 則",
+             len(candidates), len(dropped), backfilled, min(len(merged), cap))
 
     if len(merged) == 0:
-        print("[LOG/NewsMerge] ⚠️ 沒有任何可用新聞（兩方皆空或全重複）")
+        log.warning("[LOG/NewsMerge] ⚠️ 沒有任何可用新聞（兩方皆空或全重複）")
 
     return merged[:cap]
@@ -0,0 +1,155 @@
+# retrievers/metrics.py（輕量指標：counter / histogram / 計時 span，輸出 Prometheus 文字格式）
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Tuple
+
+PREFIX = "linebot_"
+
+# 秒；涵蓋快取命中（毫秒級）到 OpenAI 回應（十幾秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30)
+
+_LOCK = threading.Lock()
+_HELP: Dict[str, Tuple[str, str]] = {}   # name -> (type, help)
+# counter：(name, labels) -> value
+_COUNTERS: Dict[Tuple[str, Tuple], float] = {}
+# histogram：(name, labels) -> [bucket counts..., sum, count]
+_HISTOGRAMS: Dict[Tuple[str, Tuple], List[float]] = {}
+# gauge：name -> 取值函式（render 時才呼叫，回傳 {labels tuple: value}）
+_GAUGES: Dict[str, Callable[[], Dict[Tuple, float]]] = {}
+
+
+def _key(name: str, labels: Dict[str, str]) -> Tuple[str, Tuple]:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def describe(name: str, kind: str, help_text: str):
+    """登記指標的型別與說明（render 時輸出 # HELP / # TYPE）"""
+    _HELP[name] = (kind, help_text)
+
+
+def inc(name: str, value: float = 1.0, **labels):
+    k = _key(name, labels)
+    with _LOCK:
+        _COUNTERS[k] = _COUNTERS.get(k, 0.0) + value
+
+
+def observe(name: str, value: float, **labels):
+    k = _key(name, labels)
+    with _LOCK:
+        h = _HISTOGRAMS.get(k)
+        if h is None:
+            h = _HISTOGRAMS[k] = [0.0] * (len(DEFAULT_BUCKETS) + 2)
+        for i, le in enumerate(DEFAULT_BUCKETS):
+            if value <= le:
+                h[i] += 1
+        h[-2] += value
+        h[-1] += 1
+
+
+def register_gauge(name: str, fn: Callable[[], Dict[Tuple, float]]):
+    """登記 gauge：/metrics 被抓取時才呼叫 fn() 取目前值（例如 FinMind 剩餘額度）"""
+    _GAUGES[name] = fn
+
+
+@contextmanager
+def span(stage: str):
+    """量測一段程式的耗時，記到 stage_seconds{stage=...}（例外也照記）"""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe("stage_seconds", time.perf_counter() - t0, stage=stage)
+
+
+def call_with_span(stage: str, fn, *args, **kwargs):
+    """丟進 ThreadPoolExecutor 時用：submit(call_with_span, "price", fn, ticker)"""
+    with span(stage):
+        return fn(*args, **kwargs)
+
+
+describe("stage_seconds", "histogram", "Latency of each pipeline stage in seconds.")
+describe("upstream_request_seconds", "histogram", "Latency of upstream HTTP requests until response headers.")
+describe("upstream_requests_total", "counter", "Upstream HTTP requests by host.")
+describe("upstream_errors_total", "counter", "Upstream failures by host and kind (timeout / connection / http_4xx / http_5xx / error).")
+describe("stage_timeouts_total", "counter", "Retrieval stages that exceeded their timeout and fell back to empty results.")
+describe("openai_tokens_total", "counter", "OpenAI tokens used, by kind (prompt / completion / cached).")
+describe("openai_errors_total", "counter", "Failed OpenAI calls by exception type.")
+describe("openai_cost_twd_total", "counter", "Estimated OpenAI cost in TWD.")
+
+
+# ---------------------------------------------------------
+# Prometheus 文字格式
+# ---------------------------------------------------------
+def _fmt_labels(labels) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for k, v in labels:
+        v = str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{k}="{v}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _fmt_value(v: float) -> str:
+    v = float(v)
+    if math.isinf(v):
+        return "+Inf" if v > 0 else "-Inf"
+    return str(int(v)) if v.is_integer() else repr(v)
+
+
+def _header(out: List[str], name: str, default_kind: str):
+    kind, help_text = _HELP.get(name, (default_kind, ""))
+    if help_text:
+        out.append(f"# HELP {PREFIX}{name} {help_text}")
+    out.append(f"# TYPE {PREFIX}{name} {kind}")
+
+
+def _render_caches(out: List[str]):
+    from retrievers.ttl_cache import all_caches  # 延遲載入：ttl_cache 不依賴本模組
+
+    stats = [c.stats() for c in all_caches()]
+    counters = ("hits", "misses", "evictions", "expirations", "stale_hits", "backend_hits")
+    gauges = ("entries", "bytes")
+    for field in counters:
+        _header(out, f"cache_{field}_total", "counter")
+        for s in stats:
+            out.append(f'{PREFIX}cache_{field}_total{{cache="{s["name"]}"}} {s[field]}')
+    for field in gauges:
+        _header(out, f"cache_{field}", "gauge")
+        for s in stats:
+            out.append(f'{PREFIX}cache_{field}{{cache="{s["name"]}"}} {s[field]}')
+
+
+def render_prometheus() -> str:
+    with _LOCK:
+        counters = dict(_COUNTERS)
+        histograms = {k: list(v) for k, v in _HISTOGRAMS.items()}
+
+    out: List[str] = []
+    for name in sorted({n for n, _ in counters}):
+        _header(out, name, "counter")
+        for (n, labels), v in sorted(counters.items()):
+            if n == name:
+                out.append(f"{PREFIX}{name}{_fmt_labels(labels)} {_fmt_value(v)}")
+
+    for name in sorted({n for n, _ in histograms}):
+        _header(out, name, "histogram")
+        for (n, labels), h in sorted(histograms.items()):
+            if n != name:
+                continue
+            for i, le in enumerate(DEFAULT_BUCKETS):
+                out.append(f"{PREFIX}{name}_bucket{_fmt_labels(labels + (('le', str(le)),))} {_fmt_value(h[i])}")
+            out.append(f"{PREFIX}{name}_bucket{_fmt_labels(labels + (('le', '+Inf'),))} {_fmt_value(h[-1])}")
+            out.append(f"{PREFIX}{name}_sum{_fmt_labels(labels)} {_fmt_value(h[-2])}")
+            out.append(f"{PREFIX}{name}_count{_fmt_labels(labels)} {_fmt_value(h[-1])}")
+
+    for name, fn in sorted(_GAUGES.items()):
+        _header(out, name, "gauge")
+        for labels, v in sorted(fn().items()):
+            out.append(f"{PREFIX}{name}{_fmt_labels(labels)} {_fmt_value(v)}")
+
+    _render_caches(out)
+    return "\n".join(out) + "\n"
+
@@ -1,7 +1,16 @@
 # retrievers/news.py（含詳細 LOG 版）
+import logging
 import requests
 import feedparser
 from datetime import datetime, timedelta
+from retrievers import finmind, http_client
+from retrievers.singleflight import SingleFlight
+from retrievers.logs import get_logger
+
+log = get_logger("news")
+
+# 同一組 (公司, 代號) 的 RSS 同時只抓一次
+_RSS_FLIGHT = SingleFlight("rss")
 
 
 # ---------------------------------------------------------
@@ -12,28 +21,23 @@ def fetch_news_finmind(symbol_id: str, api_key: str, company_name: str = None):
     使用 FinMind API 的 TaiwanStockNews 資料集獲取新聞。
     ✅ 加入標題過濾：必須包含公司名稱或代號。
     ✅ 若 symbol_id 查不到，再嘗試 company_name。
+    ⚠️ 額度受限時丟出 finmind.FinMindThrottled（不回傳 []），讓呼叫端分得出「被限流」與「真的沒新聞」。
     """
-    print(f"[NEWS/FinMind] 📰 開始抓取 FinMind 新聞 → 股票代號：{symbol_id}，公司名稱：{company_name}")
+    log.debug("[NEWS/FinMind] 📰 開始抓取 FinMind 新聞 → 股票代號：%s，公司名稱：%s", symbol_id, company_name)
 
-    url = "https://api.finmindtrade.com/api/v4/data"
     start_date = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
 
     def get_data(data_id: str):
-        params = {
-            'dataset': 'TaiwanStockNews',
-            'data_id': data_id,
-            'start_date': start_date,
-            'token': api_key,
-        }
         try:
-            print(f"[NEWS/FinMind] 🔍 查詢 data_id = {data_id}")
-            res = requests.get(url, params=params, timeout=10)
-            res.raise_for_status()
-            data = res.json().get('data', [])
-            print(f"[NEWS/FinMind] ✅ API 回傳 {len(data)} 筆資料。")
+            log.debug("[NEWS/FinMind] 🔍 查詢 data_id = %s", data_id)
+            data = finmind.get_data("TaiwanStockNews", data_id, start_date=start_date, token=api_key, timeout=10)
+            log.debug("[NEWS/FinMind] ✅ API 回傳 %d 筆資料。", len(data))
             return data
+        except finmind.FinMindThrottled as e:
+            log.warning("[NEWS/FinMind] 🚦 額度受限，略過 %s：%s", data_id, e)
+            raise
         except Exception as e:
-            print(f"[NEWS/FinMind] ⚠️ API 抓取 {data_id} 失敗：{e}")
+            log.warning("[NEWS/FinMind] ⚠️ API 抓取 %s 失敗：%s", data_id, e)
             return []
 
     # Step 1️⃣：嘗試用股票代號查詢
@@ -41,12 +45,12 @@ def fetch_news_finmind(symbol_id: str, api_key: str, company_name: str = None):
 
     # Step 2️⃣：若代號沒結果、且公司名稱可用，再嘗試用名稱查
     if not data and company_name:
-        print(f"[NEWS/FinMind] ⚠️ 無 {symbol_id} 資料，改用公司名稱 '{company_name}' 查詢...")
+        log.info("[NEWS/FinMind] ⚠️ 無 %s 資料，改用公司名稱 '%s' 查詢...", symbol_id, company_name)
         data = get_data(company_name)
 
     # Step 3️⃣：若仍無資料，回傳空
     if not data:
-        print(f"[NEWS/FinMind] ❌ 找不到 {symbol_id} 或 {company_name} 的新聞資料。")
+        log.info("[NEWS/FinMind] ❌ 找不到 %s 或 %s 的新聞資料。", symbol_id, company_name)
         return []
 
     # Step 4️⃣：篩選新聞（標題須包含公司名或代號）
@@ -65,14 +69,13 @@ def fetch_news_finmind(symbol_id: str, api_key: str, company_name: str = None):
         })
 
     if not out:
-        print("[NEWS/FinMind] ⚠️ FinMind 有資料，但標題未包含公司名或代號。")
+        log.info("[NEWS/FinMind] ⚠️ FinMind 有資料，但標題未包含公司名或代號。")
         return []
 
-    print(f"[NEWS/FinMind] ✅ 篩選後保留 {min(len(out), 8)} 則新聞。")
-    for i, n in enumerate(out[:8]):
-        print(f"   [{i+1}] {n['title']} | {n['source']}")
-
-    print("[NEWS/FinMind] 🏁 FinMind 新聞抓取完成。\n")
+    log.info("[NEWS/FinMind] ✅ 篩選後保留 %d 則新聞。", min(len(out), 8))
+    if log.isEnabledFor(logging.DEBUG):
+        for i, n in enumerate(out[:8]):
+            log.debug("   [%d] %s | %s", i + 1, n["title"], n["source"], extra={"sampled": True})
     return out[:8]
 
 
@@ -83,19 +86,27 @@ def fetch_news_rss(company_name: str, symbol_id: str = None, hl="zh-TW"):
     """
     使用 Google News RSS feed 檢索新聞。
     ✅ 搜尋關鍵字：公司名稱 + 股票代號，確保更準確。
+    ✅ 相同關鍵字的併發請求會合併成一次下載（single-flight）。
     """
-    print(f"[NEWS/RSS] 🌐 開始抓取 Google News RSS → 關鍵字: '{company_name}', 代號: {symbol_id}")
+    return _RSS_FLIGHT.do((company_name, symbol_id, hl), _fetch_news_rss, company_name, symbol_id, hl)
+
+
+def _fetch_news_rss(company_name: str, symbol_id: str = None, hl="zh-TW"):
+    log.debug("[NEWS/RSS] 🌐 開始抓取 Google News RSS → 關鍵字: '%s', 代號: %s", company_name, symbol_id)
 
     encoded_query = requests.utils.quote(f"{company_name} {symbol_id}" if symbol_id else company_name)
     url = f"https://news.google.com/rss/search?q={encoded_query}&hl={hl}&gl=TW&ceid=TW:zh-Hant"
 
     try:
-        print(f"[NEWS/RSS] 🔗 RSS URL: {url}")
+        log.debug("[NEWS/RSS] 🔗 RSS URL: %s", url)
 
-        feed = feedparser.parse(url)
+        # 經共用連線池下載，再交給 feedparser 解析（feedparser 自己抓會每次重建連線）
+        res = http_client.get(url, timeout=10)
+        res.raise_for_status()
+        feed = feedparser.parse(res.content)
 
         if not hasattr(feed, "entries"):
-            print("[NEWS/RSS] ⚠️ RSS 結果異常（無 entries 欄位）")
+            log.warning("[NEWS/RSS] ⚠️ RSS 結果異常（無 entries 欄位）")
             return []
 
         out = []
@@ -108,15 +119,14 @@ def fetch_news_rss(company_name: str, symbol_id: str = None, hl="zh-TW"):
             })
 
         if not out:
-            print(f"[NEWS/RSS] ❌ 查 '{company_name}' 無新聞結果。")
+            log.info("[NEWS/RSS] ❌ 查 '%s' 無新聞結果。", company_name)
         else:
-            print(f"[NEWS/RSS] ✅ 抓取完成，共 {len(out)} 筆。")
-            for i, n in enumerate(out[:]):
-                print(f"   [{i+1}] {n['title']} | {n['source']}")
-
-        print("[NEWS/RSS] 🏁 Google News RSS 完成。\n")
+            log.info("[NEWS/RSS] ✅ 抓取完成，共 %d 筆。", len(out))
+            if log.isEnabledFor(logging.DEBUG):
+                for i, n in enumerate(out):
+                    log.debug("   [%d] %s | %s", i + 1, n["title"], n["source"], extra={"sampled": True})
         return out
 
     except Exception as e:
-        print(f"[NEWS/RSS] ❌ Google News RSS 檢索失敗：{e}")
+        log.warning("[NEWS/RSS] ❌ Google News RSS 檢索失敗：%s", e)
         return []
@@ -0,0 +1,259 @@
+# retrievers/persist.py（可選的持久化 / 跨 worker 共用快取層：本機 SQLite 或 Redis 相容服務）
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Iterator, Optional, Tuple
+
+from config import CACHE_DB_PATH, SHARED_CACHE_URL
+
+try:
+    import redis
+except ImportError:  # 只有 SHARED_CACHE_URL=redis://… 才需要
+    redis = None
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv (
+    namespace  TEXT NOT NULL,
+    key        TEXT NOT NULL,
+    value      TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+)
+"""
+
+
+class SQLiteStore:
+    """
+    以 (namespace, key) 為主鍵的 JSON 值儲存；每筆帶 expires_at，讀取時自動略過過期資料。
+    每個 process 一條連線 + Lock，所有執行緒共用；WAL 模式下同一台主機的多個 worker 可同時讀寫同一個檔案。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        d = os.path.dirname(os.path.abspath(path))
+        os.makedirs(d, exist_ok=True)
+        self._lock = threading.Lock()
+        self._pid = None
+        self._conn = None
+        with self._lock:
+            self._connect()
+
+    def _connect(self):
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(_SCHEMA)
+        self._conn.commit()
+        self._pid = os.getpid()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """fork 之後（例如 gunicorn --preload）不能沿用父行程的連線，換 pid 就重開"""
+        if self._pid != os.getpid():
+            self._connect()
+        return self._conn
+
+    def get(self, namespace: str, key: str) -> Optional[Tuple[Any, float]]:
+        """回傳 (value, expires_at)；不存在或已過期回傳 None"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT value, expires_at FROM kv WHERE namespace=? AND key=?",
+                (namespace, key),
+            ).fetchone()
+        if row is None or row[1] <= time.time():
+            return None
+        try:
+            return json.loads(row[0]), row[1]
+        except ValueError:
+            return None
+
+    def set(self, namespace: str, key: str, value: Any, ttl: float):
+        payload = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO kv (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (namespace, key, payload, time.time() + ttl),
+            )
+            self.conn.commit()
+
+    def delete(self, namespace: str, key: str):
+        with self._lock:
+            self.conn.execute("DELETE FROM kv WHERE namespace=? AND key=?", (namespace, key))
+            self.conn.commit()
+
+    def items(self, namespace: str) -> Iterator[Tuple[str, Any]]:
+        """列出某 namespace 下所有未過期的 (key, value)"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT key, value FROM kv WHERE namespace=? AND expires_at > ?",
+                (namespace, time.time()),
+            ).fetchall()
+        for key, payload in rows:
+            try:
+                yield key, json.loads(payload)
+            except ValueError:
+                continue
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cur = self.conn.execute("DELETE FROM kv WHERE expires_at <= ?", (time.time(),))
+            self.conn.commit()
+            return cur.rowcount
+
+
+# 續約或搶 lease：目前持有者是自己就延長，沒人持有就 SET NX；回傳 1 = 取得 / 續約成功
+_LEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+if redis.call('set', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    return 1
+end
+return 0
+"""
+
+
+class RedisStore:
+    """
+    與 SQLiteStore 相同介面，存在 Redis 相容服務（redis-server / valkey / keydb…）：
+    key 為 "linebot:{namespace}:{key}"，值為 {"v": value, "e": expires_at} 的 JSON，過期交給 Redis 的 PX 處理。
+    跨主機的 worker 也能共用，另外提供 acquire_lease() 給背景刷新選主。
+    """
+
+    PREFIX = "linebot:"
+
+    def __init__(self, url: str):
+        if redis is None:
+            raise RuntimeError("SHARED_CACHE_URL 使用 redis://，但尚未安裝 redis 套件（pip install redis）")
+        self.url = url
+        self._client = redis.Redis.from_url(url, socket_timeout=2, socket_connect_timeout=2)
+        self._client.ping()
+        self._lease = self._client.register_script(_LEASE_SCRIPT)
+
+    def _key(self, namespace: str, key: str) -> str:
+        return f"{self.PREFIX}{namespace}:{key}"
+
+    def get(self, namespace: str, key: str) -> Optional[Tuple[Any, float]]:
+        raw = self._client.get(self._key(namespace, key))
+        if raw is None:
+            return None
+        try:
+            payload = json.loads(raw)
+        except ValueError:
+            return None
+        if payload["e"] <= time.time():
+            return None
+        return payload["v"], payload["e"]
+
+    def set(self, namespace: str, key: str, value: Any, ttl: float):
+        if ttl <= 0:
+            return
+        payload = json.dumps({"v": value, "e": time.time() + ttl}, ensure_ascii=False)
+        self._client.set(self._key(namespace, key), payload, px=max(1, int(ttl * 1000)))
+
+    def delete(self, namespace: str, key: str):
+        self._client.delete(self._key(namespace, key))
+
+    def items(self, namespace: str) -> Iterator[Tuple[str, Any]]:
+        prefix = self._key(namespace, "")
+        for k in self._client.scan_iter(match=f"{prefix}*", count=200):
+            found = self.get(namespace, k.decode()[len(prefix):])
+            if found is not None:
+                yield k.decode()[len(prefix):], found[0]
+
+    def purge_expired(self) -> int:
+        return 0  # Redis 自己會清過期 key
+
+    def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        return bool(self._lease(keys=[self._key("lease", name)], args=[owner, max(1, int(ttl * 1000))]))
+
+
+def describe_target(url: str) -> str:
+    """log 用：去掉 URL 裡的帳號密碼"""
+    if "@" in url and "://" in url:
+        scheme, rest = url.split("://", 1)
+        return f"{scheme}://{rest.rsplit('@', 1)[1]}"
+    return url
+
+
+def open_store(url: str):
+    """redis:// 或 rediss:// → RedisStore；sqlite:///路徑 或一般檔案路徑 → SQLiteStore"""
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisStore(url)
+    if url.startswith("sqlite:///"):
+        url = url[len("sqlite:///"):]
+    return SQLiteStore(url)
+
+
+_STORE = None
+_STORE_LOCK = threading.Lock()
+_STORE_FAILED = False
+
+
+def get_store():
+    """
+    回傳共用的持久層：SHARED_CACHE_URL 優先（跨 worker 共用），其次 CACHE_DB_PATH（本機 SQLite）；
+    都未設定或開啟失敗回傳 None（只用記憶體快取）
+    """
+    global _STORE, _STORE_FAILED
+    target = SHARED_CACHE_URL or CACHE_DB_PATH
+    if not target or _STORE_FAILED:
+        return None
+    if _STORE is None:
+        with _STORE_LOCK:
+            if _STORE is None and not _STORE_FAILED:
+                try:
+                    _STORE = open_store(target)
+                    purged = _STORE.purge_expired()
+                    print(f"[CACHE/Disk] 💽 已開啟持久化快取：{describe_target(target)}（清除過期 {purged} 筆）")
+                except Exception as e:
+                    _STORE_FAILED = True
+                    print(f"[CACHE/Disk] ⚠️ 無法開啟持久化快取 {describe_target(target)}：{e}，改用純記憶體快取。")
+    return _STORE
+
+
+def get_shared_store():
+    """
+    只在 SHARED_CACHE_URL 有設定時回傳持久層：股價 / 查詢結果 / 回答這類短 TTL 快取，
+    單一 process 時寫磁碟沒有好處，多 worker 共用時才值得
+    """
+    return get_store() if SHARED_CACHE_URL else None
+
+
+class _LazyStore:
+    """
+    給模組層級的 TTLCache(backend=...) 用：import 時不開檔 / 不連 Redis，第一次讀寫才呼叫 get_store()。
+    持久層開啟失敗時 get 回傳 None、set / delete 不做事（等同只用記憶體快取）。
+    """
+
+    def __init__(self, shared_only: bool):
+        self._shared_only = shared_only
+
+    def _store(self):
+        return get_shared_store() if self._shared_only else get_store()
+
+    def get(self, namespace: str, key: str) -> Optional[Tuple[Any, float]]:
+        store = self._store()
+        return store.get(namespace, key) if store is not None else None
+
+    def set(self, namespace: str, key: str, value: Any, ttl: float):
+        store = self._store()
+        if store is not None:
+            store.set(namespace, key, value, ttl)
+
+    def delete(self, namespace: str, key: str):
+        store = self._store()
+        if store is not None:
+            store.delete(namespace, key)
+
+
+def lazy_store():
+    """同 get_store()，但延到第一次使用才開啟；兩個設定都沒有時直接回傳 None"""
+    return _LazyStore(shared_only=False) if (SHARED_CACHE_URL or CACHE_DB_PATH) else None
+
+
+def lazy_shared_store():
+    """同 get_shared_store()，但延到第一次使用才開啟"""
+    return _LazyStore(shared_only=True) if SHARED_CACHE_URL else None
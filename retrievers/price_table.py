@@ -0,0 +1,116 @@
+# retrievers/price_table.py（全市場股價表：最近兩個交易日收盤價，O(1) 查詢）
+import time
+from array import array
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from retrievers.stocks import fetch_market_prices_finmind
+
+MAX_LOOKBACK_DAYS = 10  # 往回找交易日的上限（連假也夠用）
+
+
+class MarketPriceTable:
+    """
+    以 array('d') 存放全市場「最新 / 前一交易日」收盤價，stock_id → 索引位置。
+    建好之後只讀不寫，整張表在刷新時一次替換。
+    """
+
+    def __init__(self, date: str, prev_date: str, latest: Dict[str, float], previous: Dict[str, float],
+                 built_at: Optional[float] = None):
+        self.date = date
+        self.prev_date = prev_date
+        self.built_at = time.time() if built_at is None else built_at  # 建表時間（判斷表是否太舊）
+        ids = [sid for sid in latest if sid in previous]
+        self._index: Dict[str, int] = {sid: i for i, sid in enumerate(ids)}
+        self._close = array("d", (latest[sid] for sid in ids))
+        self._prev_close = array("d", (previous[sid] for sid in ids))
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def closes_on(self, date: str) -> Optional[Dict[str, float]]:
+        """表內某交易日的收盤價 {stock_id: close}（刷新時沿用，省 API 次數）；不在表內回傳 None"""
+        if date == self.date:
+            col = self._close
+        elif date == self.prev_date:
+            col = self._prev_close
+        else:
+            return None
+        return {sid: col[i] for sid, i in self._index.items()}
+
+    def to_payload(self) -> Dict[str, Any]:
+        """JSON 可序列化的內容（寫進共用快取給其他 worker）"""
+        return {
+            "date": self.date,
+            "prev_date": self.prev_date,
+            "latest": self.closes_on(self.date),
+            "previous": self.closes_on(self.prev_date),
+            "built_at": self.built_at,
+        }
+
+    @classmethod
+    def from_payload(cls, payload: Dict[str, Any]) -> "MarketPriceTable":
+        return cls(payload["date"], payload["prev_date"], payload["latest"], payload["previous"],
+                   built_at=payload.get("built_at"))
+
+    def age(self) -> float:
+        return time.time() - self.built_at
+
+    def lookup(self, stock_id: str) -> Optional[Dict[str, Any]]:
+        """回傳與 fetch_price_finmind 相同格式的結果；查無代號回傳 None"""
+        i = self._index.get(stock_id)
+        if i is None:
+            return None
+        close = self._close[i]
+        prev_close = self._prev_close[i]
+        change = close - prev_close
+        pct = (change / prev_close * 100) if prev_close else 0.0
+        return {
+            "symbol": stock_id,
+            "price": round(close, 2),
+            "change": round(change, 2),
+            "pct": round(pct, 2),
+            "currency": "TWD",
+        }
+
+
+def _rows_to_closes(rows: List[Dict[str, Any]]) -> Dict[str, float]:
+    out: Dict[str, float] = {}
+    for r in rows:
+        sid = (r.get("stock_id") or "").strip()
+        close = r.get("close")
+        if sid and close:
+            out[sid] = float(close)
+    return out
+
+
+def build_market_table(api_key: str, previous: Optional[MarketPriceTable] = None) -> Optional[MarketPriceTable]:
+    """
+    從今天往回找最近兩個有資料的交易日，各抓一次全市場股價。
+    舊表已有的交易日直接沿用其收盤價，不重打 API（平常刷新只需查「今天」一次）。
+    找不到兩個交易日時回傳 None（呼叫端繼續用舊表或逐檔查詢）。
+    """
+    found: List[tuple] = []  # [(date, {stock_id: close}), ...]，由新到舊
+    day = datetime.now()
+    for _ in range(MAX_LOOKBACK_DAYS):
+        date = day.strftime("%Y-%m-%d")
+        is_weekend = day.weekday() >= 5
+        day -= timedelta(days=1)
+        if is_weekend:
+            continue  # 週末不開盤，不浪費 API 次數
+        closes = previous.closes_on(date) if previous is not None else None
+        if closes is None:
+            closes = _rows_to_closes(fetch_market_prices_finmind(date, api_key))
+        if closes:
+            found.append((date, closes))
+        if len(found) == 2:
+            break
+
+    if len(found) < 2:
+        print(f"[STOCKS/Bulk] ⚠️ 近 {MAX_LOOKBACK_DAYS} 天內找不到兩個交易日的全市場股價。")
+        return None
+
+    (date, latest), (prev_date, prev) = found
+    table = MarketPriceTable(date, prev_date, latest, prev)
+    print(f"[STOCKS/Bulk] ✅ 全市場股價表建立完成：{date} vs {prev_date}，共 {len(table)} 檔。")
+    return table
@@ -0,0 +1,69 @@
+# retrievers/ranking.py（BM25 排序：CJK 字元 bigram 斷詞 + NumPy 向量化打分）
+import math
+import re
+from collections import Counter
+from typing import List, Sequence
+
+import numpy as np
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+|[一-鿿]+")
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    中英混合斷詞：
+    - 英數：整個單字一個 token（單一英文字母略過，數字保留，例如股票代號）
+    - 中文：連續中文字切成字元 bigram（「台積電」→「台積」「積電」）；單獨一個中文字就保留單字
+    """
+    out: List[str] = []
+    for run in _TOKEN_RE.findall((text or "").lower()):
+        if run[0] < "一":  # 英數
+            if len(run) > 1 or run.isdigit():
+                out.append(run)
+        elif len(run) == 1:
+            out.append(run)
+        else:
+            out.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return out
+
+
+def bm25_scores(query: str, docs: Sequence[str], k1: float = BM25_K1, b: float = BM25_B) -> np.ndarray:
+    """
+    以 docs 本身為語料計算 BM25，回傳每篇的分數（shape=(len(docs),)）。
+    只針對 query 出現的詞建 tf 矩陣（n_docs × n_terms），打分一次向量化算完。
+    """
+    n = len(docs)
+    if n == 0:
+        return np.zeros(0)
+    q_terms = list(dict.fromkeys(tokenize(query)))
+    if not q_terms:
+        return np.zeros(n)
+
+    col = {t: j for j, t in enumerate(q_terms)}
+    tf = np.zeros((n, len(q_terms)), dtype=np.float64)
+    doc_len = np.zeros(n, dtype=np.float64)
+    for i, d in enumerate(docs):
+        toks = tokenize(d)
+        doc_len[i] = len(toks)
+        for t, c in Counter(toks).items():
+            j = col.get(t)
+            if j is not None:
+                tf[i, j] = c
+
+    df = np.count_nonzero(tf, axis=0)
+    idf = np.log1p((n - df + 0.5) / (df + 0.5))
+    avgdl = doc_len.mean() or 1.0
+    norm = k1 * (1.0 - b + b * doc_len / avgdl)            # (n,)
+    weight = tf * (k1 + 1.0) / (tf + norm[:, None])       # (n, n_terms)
+    return weight @ idf
+
+
+def top_indices(scores: np.ndarray, k: int) -> List[int]:
+    """分數 > 0 的前 k 名（同分時取較前面的）"""
+    if scores.size == 0 or k <= 0:
+        return []
+    order = np.argsort(-scores, kind="stable")[:k]
+    return [int(i) for i in order if scores[i] > 0 and not math.isnan(scores[i])]
@@ -1,6 +1,10 @@
 # retrievers/stocks.py（含 LOG 版）
-import requests
 from datetime import datetime, timedelta
+from retrievers import finmind
+from retrievers.logs import get_logger
+
+log = get_logger("stocks")
+
 
 def fetch_price_finmind(symbol_id: str, api_key: str):
     """
@@ -14,32 +18,21 @@ def fetch_price_finmind(symbol_id: str, api_key: str):
     Returns:
         dict: 包含股價詳細資訊的字典，或 None。
     """
-    print(f"[STOCKS/FinMind] ⏳ 從 FinMind 抓取股價 → {symbol_id}")
+    log.debug("[STOCKS/FinMind] ⏳ 從 FinMind 抓取股價 → %s", symbol_id)
 
-    # 設定 API 的 URL 和參數
-    url = "https://api.finmindtrade.com/api/v4/data"
     start_date = (datetime.now() - timedelta(days=5)).strftime('%Y-%m-%d')
-    
-    params = {
-        'dataset': 'TaiwanStockPrice',
-        'data_id': symbol_id,
-        'start_date': start_date,
-        'token': api_key,
-    }
 
     try:
-        print(f"[STOCKS/FinMind] 🔗 API 請求中（symbol={symbol_id}, start={start_date}）...")
-        res = requests.get(url, params=params, timeout=10)
-        res.raise_for_status()
-        data = res.json()
+        log.debug("[STOCKS/FinMind] 🔗 API 請求中（symbol=%s, start=%s）...", symbol_id, start_date)
+        # 經 retrievers/finmind.py 統一限流 / 退避
+        stock_data = finmind.get_data("TaiwanStockPrice", symbol_id, start_date=start_date, token=api_key, timeout=10)
 
         # 檢查 API 是否成功回傳資料
-        stock_data = data.get('data')
         if not stock_data or len(stock_data) < 2:
-            print(f"[STOCKS/FinMind] ⚠️ 回傳資料不足兩筆，無法計算漲跌。({len(stock_data) if stock_data else 0} 筆)")
+            log.warning("[STOCKS/FinMind] ⚠️ 回傳資料不足兩筆，無法計算漲跌。(%d 筆)", len(stock_data) if stock_data else 0)
             return None
 
-        print(f"[STOCKS/FinMind] ✅ API 成功回傳 {len(stock_data)} 筆資料。")
+        log.debug("[STOCKS/FinMind] ✅ API 成功回傳 %d 筆資料。", len(stock_data))
 
         # --- 解析與計算 ---
         latest_data = stock_data[-1]
@@ -59,9 +52,34 @@ def fetch_price_finmind(symbol_id: str, api_key: str):
             "currency": "TWD"
         }
 
-        print(f"[STOCKS/FinMind] 📊 股價計算完成：{result['symbol']} 收盤 {result['price']} ({'+' if result['change']>=0 else ''}{result['change']} / {result['pct']}%)")
+        log.info("[STOCKS/FinMind] 📊 股價計算完成：%s 收盤 %s (%+g / %s%%)", result["symbol"], result["price"], result["change"], result["pct"])
         return result
 
     except Exception as e:
-        print(f"[STOCKS/FinMind] ❌ 抓取 {symbol_id} 時發生錯誤：{e}\n")
+        log.warning("[STOCKS/FinMind] ❌ 抓取 %s 時發生錯誤：%s", symbol_id, e)
         return None
+
+
+# ---------------------------------------------------------
+# 全市場單日股價（bulk 模式）
+# ---------------------------------------------------------
+def fetch_market_prices_finmind(date: str, api_key: str):
+    """
+    一次抓取全市場某一交易日的 TaiwanStockPrice（不帶 data_id）。
+    需 FinMind 方案支援全市場查詢。
+
+    Args:
+        date (str): 交易日 'YYYY-MM-DD'。
+        api_key (str): 您的 FinMind API Token。
+
+    Returns:
+        list: [{stock_id, close, ...}, ...]；非交易日或失敗回傳空 list。
+    """
+    try:
+        data = finmind.get_data("TaiwanStockPrice", start_date=date, end_date=date, token=api_key, timeout=20)
+        log.info("[STOCKS/FinMind] 📦 全市場股價 %s：%d 筆。", date, len(data))
+        return data
+    except Exception as e:
+        log.warning("[STOCKS/FinMind] ❌ 抓取全市場股價 %s 失敗：%s", date, e)
+        return []
+
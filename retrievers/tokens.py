@@ -0,0 +1,44 @@
+# retrievers/tokens.py（Token 計數：有 tiktoken 就用，沒有就用離線估算）
+import re
+import threading
+
+_ENCODING_NAME = "o200k_base"  # gpt-4o / gpt-4o-mini 使用的編碼
+_ENC = None
+_ENC_LOADED = False
+_ENC_LOCK = threading.Lock()
+
+# CJK 統一漢字 + 全形標點/符號：大約 1 字 ≈ 1 token
+_CJK_RE = re.compile(r"[　-〿㐀-䶿一-鿿＀-￯]")
+
+
+def _get_encoding():
+    """第一次用到才載入 tiktoken（可能需下載編碼檔），失敗就永遠改用估算"""
+    global _ENC, _ENC_LOADED
+    if not _ENC_LOADED:
+        with _ENC_LOCK:
+            if not _ENC_LOADED:
+                try:
+                    import tiktoken
+                    _ENC = tiktoken.get_encoding(_ENCODING_NAME)
+                except Exception:
+                    _ENC = None
+                _ENC_LOADED = True
+    return _ENC
+
+
+def estimate_tokens(text: str) -> int:
+    """離線估算：CJK 字元每字 1 token，其餘字元約 4 字 1 token"""
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    other = len(text) - cjk
+    return cjk + (other + 3) // 4
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    enc = _get_encoding()
+    if enc is None:
+        return estimate_tokens(text)
+    return len(enc.encode(text))
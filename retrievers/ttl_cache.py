@@ -0,0 +1,220 @@
+# retrievers/ttl_cache.py（有上限的 LRU + TTL 快取，取代各模組手刻的 dict 快取）
+import sys
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+# 所有建立過的快取（/metrics 會逐一輸出 stats()）；WeakSet 不會讓快取因此無法回收
+_INSTANCES: "weakref.WeakSet" = weakref.WeakSet()
+
+
+def all_caches() -> List["TTLCache"]:
+    return sorted(_INSTANCES, key=lambda c: c.name)
+
+
+def approx_size(value: Any) -> int:
+    """粗估物件佔用的 bytes（遞迴計算 dict/list/tuple/set 內容），只用來做容量上限"""
+    if isinstance(value, (str, bytes, int, float, bool)) or value is None:
+        return sys.getsizeof(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(approx_size(k) + approx_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(approx_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class TTLCache:
+    """
+    Thread-safe 的 LRU + TTL 快取：
+    - ttl：每筆資料的存活秒數（set 時可個別覆寫）
+    - stale_ttl：過期後仍保留在記憶體的寬限秒數，供 get_stale() 做 stale-while-revalidate
+    - max_entries / max_bytes：超過上限時從最久沒用的開始淘汰
+    - 過期資料在讀取時移除，另外每隔一段寫入次數做一次全表清理
+    - stats() 提供 hits / misses / evictions / expirations 計數
+    - backend + namespace（可選）：寫入時同步存到持久層，記憶體未命中時回頭讀持久層
+    """
+
+    _PURGE_EVERY = 256  # 每幾次 set 掃一次過期資料
+
+    def __init__(
+        self,
+        name: str,
+        ttl: float,
+        max_entries: int = 1000,
+        max_bytes: Optional[int] = None,
+        sizeof: Callable[[Any], int] = approx_size,
+        backend: Any = None,
+        namespace: Optional[str] = None,
+        stale_ttl: float = 0,
+    ):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self.backend = backend
+        self.namespace = namespace or name
+        # key -> (value, expires_at, size)
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self._sets_since_purge = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.backend_hits = 0
+        self.stale_hits = 0
+        _INSTANCES.add(self)
+
+    # -----------------------------------------------------
+    # 讀取
+    # -----------------------------------------------------
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                value, expires_at, _ = item
+                now = time.time()
+                if now < expires_at:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                if now >= expires_at + self.stale_ttl:
+                    self._remove(key)
+                    self.expirations += 1
+
+        # 記憶體未命中 → 查持久層（在鎖外做 I/O）
+        if self.backend is not None:
+            try:
+                found = self.backend.get(self.namespace, str(key))
+            except Exception as e:
+                print(f"[CACHE/{self.name}] ⚠️ 讀取持久層失敗：{e}")
+                found = None
+            if found is not None:
+                value, expires_at = found
+                self._put(key, value, expires_at)
+                with self._lock:
+                    self.hits += 1
+                    self.backend_hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return default
+
+    def get_stale(self, key: Hashable):
+        """
+        Stale-while-revalidate 用：回傳 (value, is_fresh)。
+        - 新鮮資料 → (value, True)
+        - 已過期但仍在 stale_ttl 寬限內 → (value, False)，呼叫端可先回舊值再背景刷新
+        - 其他情況交給 get()（含持久層）→ 找到為 (value, True)，否則 (None, False)
+        """
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                value, expires_at, _ = item
+                now = time.time()
+                if expires_at <= now < expires_at + self.stale_ttl:
+                    self._data.move_to_end(key)
+                    self.stale_hits += 1
+                    return value, False
+        value = self.get(key)
+        return value, value is not None
+
+    def ttl_remaining(self, key: Hashable) -> float:
+        """剩餘存活秒數（不存在或已過期回傳 0；不影響命中統計與 LRU 順序）"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return 0.0
+            return max(0.0, item[1] - time.time())
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.ttl_remaining(key) > 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    # -----------------------------------------------------
+    # 寫入 / 刪除
+    # -----------------------------------------------------
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        self._put(key, value, time.time() + ttl)
+        if self.backend is not None:
+            try:
+                self.backend.set(self.namespace, str(key), value, ttl)
+            except Exception as e:
+                print(f"[CACHE/{self.name}] ⚠️ 寫入持久層失敗：{e}")
+
+    def _put(self, key: Hashable, value: Any, expires_at: float):
+        size = self._sizeof(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return  # 單筆就超過上限，不快取
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, expires_at, size)
+            self._bytes += size
+
+            self._sets_since_purge += 1
+            if self._sets_since_purge >= self._PURGE_EVERY:
+                self._purge_expired()
+
+            while self._data and (
+                len(self._data) > self.max_entries
+                or (self.max_bytes is not None and self._bytes > self.max_bytes)
+            ):
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+        if self.backend is not None:
+            try:
+                self.backend.delete(self.namespace, str(key))
+            except Exception as e:
+                print(f"[CACHE/{self.name}] ⚠️ 刪除持久層資料失敗：{e}")
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def _remove(self, key: Hashable):
+        _, _, size = self._data.pop(key)
+        self._bytes -= size
+
+    def _purge_expired(self):
+        cutoff = time.time() - self.stale_ttl
+        expired = [k for k, (_, exp, _) in self._data.items() if exp <= cutoff]
+        for k in expired:
+            self._remove(k)
+        self.expirations += len(expired)
+        self._sets_since_purge = 0
+
+    # -----------------------------------------------------
+    # 統計
+    # -----------------------------------------------------
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "name": self.name,
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "backend_hits": self.backend_hits,
+                "stale_hits": self.stale_hits,
+            }
@@ -1,11 +1,67 @@
 from openai import OpenAI
 from config import OPENAI_API_KEY
 import re
+import hashlib
+import threading
+import unicodedata
 from datetime import datetime
 from email.utils import parsedate_to_datetime
+from retrievers.ttl_cache import TTLCache
+from retrievers.persist import lazy_shared_store
+from retrievers.deadline import Deadline
+from retrievers import metrics
+from retrievers.logs import get_logger
+
+log = get_logger("gpt")
 
 client = OpenAI(api_key=OPENAI_API_KEY)
 
+# === 回答快取：相同（正規化後的）問題 + 相同 context → 直接沿用上次回答，不再呼叫 OpenAI ===
+ANSWER_CACHE_TTL = 600  # 10 分鐘
+ANSWER_CACHE = TTLCache(
+    "answer", ttl=ANSWER_CACHE_TTL, max_entries=500, max_bytes=4 * 1024 * 1024,
+    backend=lazy_shared_store(),  # SHARED_CACHE_URL 有設定時各 worker 共用
+)
+ANSWER_STATS = {"hits": 0, "misses": 0, "saved_tokens": 0, "saved_cost_twd": 0.0}
+_ANSWER_STATS_LOCK = threading.Lock()
+
+# === 時間預算：剩餘時間不足時縮短輸出長度（降級的最後一步）===
+MAX_TOKENS = 1000
+REDUCED_MAX_TOKENS = 500
+GPT_FULL_SECONDS = 8        # 剩餘時間低於此值就改用 REDUCED_MAX_TOKENS
+OPENAI_TIMEOUT_SECONDS = 30
+
+
+def _evidence_tiers_line(context: str) -> str:
+    """取出 rag.py 寫在 context 的「[證據層級] ...」那一行內容（沒有就回傳空字串）"""
+    m = re.search(r"^\[證據層級\]\s*(.+)$", context, flags=re.MULTILINE)
+    return m.group(1).strip() if m else ""
+
+
+def _estimate_cost_twd(prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> float:
+    """gpt-4o-mini 定價：輸入 $0.15/1M（命中 prompt cache 的部分 $0.075/1M）、輸出 $0.6/1M"""
+    uncached = prompt_tokens - cached_tokens
+    cost_usd = uncached * 0.00015 / 1000 + cached_tokens * 0.000075 / 1000 + completion_tokens * 0.0006 / 1000
+    return cost_usd * 32
+
+
+def _normalize_query(query: str) -> str:
+    """全半形統一、轉大寫、去掉空白與標點：「台積電 會漲嗎？」與「台積電會漲嗎?」視為同一問題"""
+    q = unicodedata.normalize("NFKC", query or "").upper()
+    return re.sub(r"[\W_]+", "", q)
+
+
+def _answer_cache_key(user_query: str, context: str) -> str:
+    ctx_hash = hashlib.sha1(context.encode("utf-8")).hexdigest()
+    return f"{_normalize_query(user_query)}|{ctx_hash}"
+
+
+def _log_answer_cache_stats():
+    with _ANSWER_STATS_LOCK:
+        s = dict(ANSWER_STATS)
+    log.info("LOG: 回答快取 -> hits=%d, misses=%d, 累計省下 tokens=%d（≈ %.4f 元台幣）",
+             s["hits"], s["misses"], s["saved_tokens"], s["saved_cost_twd"])
+
 def _normalize_date(date_str: str) -> str:
     """
     把各種日期格式統一成 YYYY/MM/DD,並移除時間。
@@ -55,27 +111,10 @@ SYSTEM_PROMPT = (
     "最後一行一律附上「（僅供參考，不構成投資建議）」"
 )
 
-def summarize_with_gpt(user_query: str, context: str):
-    """
-    使用 GPT 對使用者完整問題進行分析與摘要，結合 RAG context。
-    """
-
-    # === 若 RAG 回傳找不到公司名稱的訊息，直接回覆固定模板 ===
-    if context.startswith("抱歉，找不到與") or "查無公司" in context:
-        print("[GPT/Skip] 🚫 跳過 GPT 呼叫（因未辨識出公司名稱）")
-        return f"抱歉，根據目前的資料，無法找到與「{user_query}」相關的公司或其股價資訊。\n請確認公司名稱或代號是否正確，以便提供更準確的分析。\n\n（僅供參考，不構成投資建議）"
-
-    prompt = f"""
-使用者的原始問題如下：
-「{user_query}」
-
-以下是你可參考的最新檢索資料（股價與新聞）：
----
-{context}
----
-
-請根據使用者的問題意圖與上述資料，生成有條理的中文回覆。
-
+# 固定的回覆規則：每次請求都一模一樣，放在 system 訊息當作穩定前綴。
+# OpenAI 會對 ≥1024 tokens 的相同前綴自動做 prompt caching（計價打折、延遲較低），
+# 因此這段內容不可以夾帶任何每次請求都不同的資料。
+ANSWER_RULES = """
 ✅ 請遵守以下原則（非常重要）：
 
 【立場判斷規則（必須遵守）】
@@ -185,115 +224,194 @@ def summarize_with_gpt(user_query: str, context: str):
 ⚠️【風險與需要追蹤的點】：
 - 2-4 點條列（例如：缺少內文/缺少數字/事件尚未確認/利多利空的條件）。
   能引用就引用；不能引用就直接說資料不足。
+"""
 
+SYSTEM_MESSAGE = SYSTEM_PROMPT + "\n\n" + ANSWER_RULES.strip()
 
 
-"""
-    try:
-        resp = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": prompt},
-            ],
-            temperature=0.4,  # 降低溫度，讓語氣更穩重、少安撫語
-            max_tokens=1000,
-        )
+# ---------------------------------------------------------
+# 回覆後處理：引用來源 / 證據層級 / 免責聲明
+# ---------------------------------------------------------
+def _extract_sources_map(context: str) -> dict:
+    """
+    從 context 中抓出新聞來源清單的每一行：
+    [1] 標題 | 來源 | 日期 | url
+    回傳 dict: { "1": "標題 | 來源 | 日期", ... }  (不含 url)
+    """
+    src_map = {}
+    # 找所有形如：[n] ... 的行
+    for m in re.finditer(r"^\[(\d+)\]\s*(.+)$", context, flags=re.MULTILINE):
+        idx = m.group(1)
+        line = m.group(2).strip()
 
-        # ✅ 新增這段來顯示 Token 用量
-        usage = resp.usage
-        print(f"LOG: Token 使用情況 -> prompt={usage.prompt_tokens}, completion={usage.completion_tokens}, total={usage.total_tokens}")
-        cost_usd = usage.prompt_tokens * 0.00015 / 1000 + usage.completion_tokens * 0.0006 / 1000
-        cost_twd = cost_usd * 32
-        print(f"LOG: 預估成本 ≈ {cost_twd:.4f} 元台幣\n")
-
-
-        def _extract_sources_map(context: str) -> dict:
-            """
-            從 context 中抓出新聞來源清單的每一行：
-            [1] 標題 | 來源 | 日期 | url
-            回傳 dict: { "1": "標題 | 來源 | 日期", ... }  (不含 url)
-            """
-            src_map = {}
-            # 找所有形如：[n] ... 的行
-            for m in re.finditer(r"^\[(\d+)\]\s*(.+)$", context, flags=re.MULTILINE):
-                idx = m.group(1)
-                line = m.group(2).strip()
-
-                # 你的來源行是：標題 | source | date 
-                parts = [p.strip() for p in line.split("|")]
-                if len(parts) >= 4:
-                    title = parts[0]
-                    source = parts[1]
-                    date_raw = parts[2]
-
-                    # (可選) 去掉 title 尾巴重複的「- 來源」
-                    if " - " in title:
-                        tail = title.rsplit(" - ", 1)[-1].strip()
-                        if tail == source:
-                            title = title.rsplit(" - ", 1)[0].strip()
-
-                    date_norm = _normalize_date(date_raw)
-
-                    # 最終只輸出：標題 | 來源 | YYYY/MM/DD
-                    src_map[idx] = f"{title} | {source} | {date_norm}"
-                else:
-                    continue  # 不是來源行就跳過
-
-
-            return src_map
-
-
-        def _extract_used_citations(text: str) -> list:
-            """
-            從模型輸出抓出所有引用編號 [n]
-            回傳去重後、依數字排序的 list[str]
-            """
-            ids = re.findall(r"\[(\d+)\]", text)
-            ids = sorted(set(ids), key=lambda x: int(x))
-            return ids
-
-
-        def _remove_existing_reference_block(text: str) -> str:
-            """
-            移除模型自己產生的 🔗【引用來源】段落（避免重複/漏列）
-            """
-            # 從 🔗【引用來源】 開始刪到文末（或下一個段落），這裡簡單刪到文末最穩
-            return re.sub(r"\n*🔗【引用來源】[\s\S]*$", "", text).rstrip()
+        # 你的來源行是：標題 | source | date 
+        parts = [p.strip() for p in line.split("|")]
+        if len(parts) >= 4:
+            title = parts[0]
+            source = parts[1]
+            date_raw = parts[2]
 
+            # (可選) 去掉 title 尾巴重複的「- 來源」
+            if " - " in title:
+                tail = title.rsplit(" - ", 1)[-1].strip()
+                if tail == source:
+                    title = title.rsplit(" - ", 1)[0].strip()
 
-        # ---- after receiving model output ----
-        text = resp.choices[0].message.content.strip()
+            date_norm = _normalize_date(date_raw)
 
-        # 1) 抓出正文用到的引用編號
-        used_ids = _extract_used_citations(text)
+            # 最終只輸出：標題 | 來源 | YYYY/MM/DD
+            src_map[idx] = f"{title} | {source} | {date_norm}"
+        else:
+            continue  # 不是來源行就跳過
 
-        # 2) 從 context 抓出每個編號對應的來源行（不含 url）
-        src_map = _extract_sources_map(context)
 
-        # 3) 組裝引用來源段落（只列實際用到的）
-        lines = []
-        for cid in used_ids:
-            if cid in src_map:
-                lines.append(f"- [{cid}] {src_map[cid]}")
-            else:
-                # 若模型引用到 context 沒有的編號，這裡選擇不列出並印 log（也可直接忽略）
-                print(f"[WARN] citation [{cid}] not found in context source list")
+    return src_map
 
-        ref_block = "🔗【引用來源】：\n" + ("\n".join(lines) if lines else "-（本次未使用新聞引用）")
 
-        # 4) 移除模型原本引用來源段落，換成你程式生成的
-        text = _remove_existing_reference_block(text)
-        text = text.rstrip() + "\n\n" + ref_block
+def _extract_used_citations(text: str) -> list:
+    """
+    從模型輸出抓出所有引用編號 [n]
+    回傳去重後、依數字排序的 list[str]
+    """
+    ids = re.findall(r"\[(\d+)\]", text)
+    ids = sorted(set(ids), key=lambda x: int(x))
+    return ids
 
-        # 5) 免責保底（避免漏掉或重複）
-        disclaimer = "（僅供參考，不構成投資建議）"
-        text = text.replace(disclaimer + "\n" + disclaimer, disclaimer)
-        if not text.endswith(disclaimer):
-            text = text.rstrip() + "\n\n" + disclaimer
 
+def _remove_existing_reference_block(text: str) -> str:
+    """
+    移除模型自己產生的 🔗【引用來源】段落（避免重複/漏列）
+    """
+    # 從 🔗【引用來源】 開始刪到文末（或下一個段落），這裡簡單刪到文末最穩
+    return re.sub(r"\n*🔗【引用來源】[\s\S]*$", "", text).rstrip()
+
+
+def postprocess_answer(text: str, context: str, reduced: bool = False) -> str:
+    """
+    模型輸出的後處理（不呼叫 API，可單獨量測）：
+    依正文實際引用的 [n] 重建引用來源、附上證據層級、補免責聲明。
+    reduced=True 表示因時間預算縮短了輸出長度。
+    """
+    text = (text or "").strip()
+
+    # 1) 抓出正文用到的引用編號
+    used_ids = _extract_used_citations(text)
+
+    # 2) 從 context 抓出每個編號對應的來源行（不含 url）
+    src_map = _extract_sources_map(context)
+
+    # 3) 組裝引用來源段落（只列實際用到的）
+    lines = []
+    for cid in used_ids:
+        if cid in src_map:
+            lines.append(f"- [{cid}] {src_map[cid]}")
+        else:
+            # 若模型引用到 context 沒有的編號，這裡選擇不列出並印 log（也可直接忽略）
+            log.warning("[WARN] citation [%s] not found in context source list", cid)
+
+    ref_block = "🔗【引用來源】：\n" + ("\n".join(lines) if lines else "-（本次未使用新聞引用）")
+
+    # 4) 移除模型原本引用來源段落，換成你程式生成的
+    text = _remove_existing_reference_block(text)
+    text = text.rstrip() + "\n\n" + ref_block
+
+    # 4.5) 註明本次使用的證據層級（時間不夠時會列出略過的項目）
+    tiers = _evidence_tiers_line(context)
+    if reduced:
+        tiers = (tiers + "；" if tiers else "") + "因時間限制精簡回覆"
+    if tiers:
+        text = text.rstrip() + "\n\n🧾【證據層級】：" + tiers
+
+    # 5) 免責保底（避免漏掉或重複）
+    disclaimer = "（僅供參考，不構成投資建議）"
+    text = text.replace(disclaimer + "\n" + disclaimer, disclaimer)
+    if not text.endswith(disclaimer):
+        text = text.rstrip() + "\n\n" + disclaimer
+
+    return text
+
+
+def summarize_with_gpt(user_query: str, context: str, deadline: Deadline = None):
+    """
+    使用 GPT 對使用者完整問題進行分析與摘要，結合 RAG context。
+    deadline（可選）：剩餘時間不足時改用較小的 max_tokens，並以剩餘時間作為 API timeout。
+    """
+
+    # === 若 RAG 回傳找不到公司名稱的訊息，直接回覆固定模板 ===
+    if context.startswith("抱歉，找不到與") or "查無公司" in context:
+        log.info("[GPT/Skip] 🚫 跳過 GPT 呼叫（因未辨識出公司名稱）")
+        return f"抱歉，根據目前的資料，無法找到與「{user_query}」相關的公司或其股價資訊。\n請確認公司名稱或代號是否正確，以便提供更準確的分析。\n\n（僅供參考，不構成投資建議）"
+
+    # === 回答快取 ===
+    cache_key = _answer_cache_key(user_query, context)
+    cached = ANSWER_CACHE.get(cache_key)
+    if cached is not None:
+        with _ANSWER_STATS_LOCK:
+            ANSWER_STATS["hits"] += 1
+            ANSWER_STATS["saved_tokens"] += cached["total_tokens"]
+            ANSWER_STATS["saved_cost_twd"] += cached["cost_twd"]
+        log.info("[GPT/Cache] ✅ 回答快取命中，略過 OpenAI 呼叫（省下 %d tokens）", cached["total_tokens"])
+        _log_answer_cache_stats()
+        return cached["text"]
+    with _ANSWER_STATS_LOCK:
+        ANSWER_STATS["misses"] += 1
+
+    # === 時間預算 ===
+    max_tokens = MAX_TOKENS
+    timeout = OPENAI_TIMEOUT_SECONDS
+    if deadline is not None:
+        if deadline.remaining() < GPT_FULL_SECONDS:
+            max_tokens = REDUCED_MAX_TOKENS
+            log.info("[GPT/Budget] ⏱️ 剩餘 %.1f 秒，max_tokens 降為 %d。", deadline.remaining(), max_tokens)
+        timeout = deadline.cap(OPENAI_TIMEOUT_SECONDS, floor=3)
+
+    # 使用者問題與 context 放在 user 訊息；固定規則在 system 訊息（穩定前綴，可命中 OpenAI prompt caching）
+    prompt = f"""
+使用者的原始問題如下：
+「{user_query}」
+
+以下是你可參考的最新檢索資料（股價與新聞）：
+---
+{context}
+---
+
+請根據使用者的問題意圖與上述資料，並遵守系統訊息中的原則與輸出格式，生成有條理的中文回覆。
+"""
+    try:
+        with metrics.span("openai"):
+            resp = client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[
+                    {"role": "system", "content": SYSTEM_MESSAGE},
+                    {"role": "user", "content": prompt},
+                ],
+                temperature=0.4,  # 降低溫度，讓語氣更穩重、少安撫語
+                max_tokens=max_tokens,
+                timeout=timeout,
+            )
+
+        # ✅ 新增這段來顯示 Token 用量
+        usage = resp.usage
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = (getattr(details, "cached_tokens", 0) or 0) if details else 0
+        log.info("LOG: Token 使用情況 -> prompt=%d（cached=%d）, completion=%d, total=%d",
+                 usage.prompt_tokens, cached_tokens, usage.completion_tokens, usage.total_tokens)
+        cost_twd = _estimate_cost_twd(usage.prompt_tokens, usage.completion_tokens, cached_tokens)
+        log.info("LOG: 預估成本 ≈ %.4f 元台幣", cost_twd)
+        metrics.inc("openai_tokens_total", usage.prompt_tokens, kind="prompt")
+        metrics.inc("openai_tokens_total", usage.completion_tokens, kind="completion")
+        metrics.inc("openai_tokens_total", cached_tokens, kind="cached")
+        metrics.inc("openai_cost_twd_total", cost_twd)
+        _log_answer_cache_stats()
+
+        # ---- after receiving model output ----
+        text = postprocess_answer(resp.choices[0].message.content, context, reduced=max_tokens < MAX_TOKENS)
+
+        if max_tokens == MAX_TOKENS:  # 精簡版回覆不快取
+            ANSWER_CACHE.set(cache_key, {"text": text, "total_tokens": usage.total_tokens, "cost_twd": cost_twd})
         return text
 
     except Exception as e:
-        print(f"LOG: OpenAI API 呼叫失敗: {e}")
+        metrics.inc("openai_errors_total", kind=type(e).__name__)
+        log.error("LOG: OpenAI API 呼叫失敗: %s", e)
         return "抱歉，AI 分析時發生問題，請稍後再試。"
\ No newline at end of file
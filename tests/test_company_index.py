@@ -0,0 +1,41 @@
+# tests/test_company_index.py（錯字容錯的正反例：該找到的要找到，一般詞彙不能被當成公司）
+from retrievers.company_index import CompanyIndex
+
+STOCKS = {
+    "2330": "台積電",
+    "2454": "聯發科",
+    "3045": "台灣大",
+    "2412": "中華電",
+    "2882": "國泰金",
+    "4245": "台灣導航",
+}
+
+
+def _index() -> CompanyIndex:
+    stock_map = {}
+    for code, name in STOCKS.items():
+        stock_map[name] = code
+        stock_map[code] = code
+    return CompanyIndex(stock_map)
+
+
+def _top_code(index: CompanyIndex, query: str):
+    found = index.fuzzy_find(query)
+    return found[0][1] if found else None
+
+
+def test_fuzzy_find_typos():
+    index = _index()
+    assert _top_code(index, "台機電") == "2330"        # 三字名稱：中間一字打錯
+    assert _top_code(index, "台積店") == "2330"        # 查詢本身就是名稱：尾字打錯
+    assert _top_code(index, "台積店會漲嗎") == "2330"  # 查詢開頭的名稱 + 常見接續字詞
+    assert _top_code(index, "聯法科今天為什麼跌") == "2454"
+    assert _top_code(index, "台灣導行") == "4245"      # 四字名稱：錯一字
+
+
+def test_fuzzy_find_rejects_everyday_words():
+    index = _index()
+    assert index.fuzzy_find("台灣經濟如何") == []      # 台灣大：只對到兩字 + 刪字
+    assert index.fuzzy_find("國泰人壽") == []          # 國泰金：尾字不同，「人壽」是同一個詞
+    assert index.fuzzy_find("我支持中華隊") == []      # 中華電：不在查詢開頭，尾字不同
+    assert index.fuzzy_find("國泰人壽的保單") == []
@@ -0,0 +1,28 @@
+# tests/test_dedup.py（近似重複分群：轉載要併、數字不同的不同期新聞不能併）
+from retrievers.dedup import cluster_near_duplicates
+
+
+def _titles(items):
+    return [i["title"] for i in items]
+
+
+def test_syndicated_copies_are_merged():
+    items = [
+        {"title": "台積電9月營收創新高 年增36%", "source": "經濟日報"},
+        {"title": "台積電9月營收創新高 年增36% - 經濟日報", "source": "Google News"},
+        {"title": "【快訊】", "source": "a"},
+        {"title": "【快訊】", "source": "b"},
+    ]
+    kept, dropped = cluster_near_duplicates(items, 0.7)
+    assert _titles(kept) == ["台積電9月營收創新高 年增36%", "【快訊】"]
+    assert len(dropped) == 2
+
+
+def test_different_figures_are_kept_apart():
+    items = [
+        {"title": "台積電9月營收創新高 年增36%"},
+        {"title": "台積電10月營收創新高 年增36%"},   # 共用 36 但月份不同
+        {"title": "台積電營收創新高"},               # 沒有數字
+    ]
+    kept, _ = cluster_near_duplicates(items, 0.7)
+    assert len(kept) == 3